@@ -1,15 +1,13 @@
 # FastAPI imports
 from fastapi import Depends
-from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
-# Typing imports
-from typing import Annotated
+from fastapi.security import OAuth2PasswordBearer
 # Local imports
 from app.services.security import jwt_token
-from app.utils.database import get_db
+from app.utils.database import get_async_db
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl=f"http://localhost:8000/v1/user/access-token")
 
-def get_current_user(token: Annotated[str, Depends(oauth2_scheme)], db_session=Depends(get_db)):
+async def get_current_user(token: str = Depends(oauth2_scheme), db_session=Depends(get_async_db)):
     """
     Get the current user's information from a JSON Web Token (JWT).
 
@@ -17,6 +15,6 @@ def get_current_user(token: Annotated[str, Depends(oauth2_scheme)], db_session=D
     - token (str): The JWT token obtained from the request header.
 
     Returns:
-    - TokenPayload: The payload of the decoded and validated JWT, representing the current user's information.
+    - UserPrincipal: The user of the validated JWT, cached until the token expires.
     """
-    return jwt_token.decode_token(db_session, token)
+    return await jwt_token.decode_token(db_session, token)
@@ -0,0 +1,65 @@
+import time
+# Starlette imports
+from starlette.routing import Match
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+# Local imports
+from app.services.metrics import http_request_duration, http_requests, http_requests_in_flight
+
+# Route label of the requests matching no route, keeps the label set bounded
+UNMATCHED_ROUTE = "<unmatched>"
+# Scope key caching the templated path of the request
+ROUTE_SCOPE_KEY = "app.route_template"
+
+
+def route_template(scope: Scope) -> str:
+    """
+        Return the templated path of the route matching the request, e.g.
+        /v1/dog/{dog_id}, so that the metrics have one series per route.
+        The result is kept in the scope for the next middlewares.
+    """
+    if ROUTE_SCOPE_KEY in scope:
+        return scope[ROUTE_SCOPE_KEY]
+    partial = None
+    for route in scope["app"].routes:
+        match, _ = route.matches(scope)
+        if match == Match.FULL:
+            partial = route.path
+            break
+        if match == Match.PARTIAL and partial is None:
+            partial = route.path
+    scope[ROUTE_SCOPE_KEY] = partial or UNMATCHED_ROUTE
+    return scope[ROUTE_SCOPE_KEY]
+
+
+class MetricsMiddleware:
+    """
+        Pure ASGI middleware recording the count, latency, in-flight requests
+        and status codes of each route. Streaming responses are timed until
+        their last chunk is sent.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        method = scope["method"]
+        route = route_template(scope)
+        status_code = 500
+
+        async def send_wrapper(message: Message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        http_requests_in_flight.inc(method=method, route=route)
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            http_request_duration.observe(time.perf_counter() - start, method=method, route=route)
+            http_requests.inc(method=method, route=route, status=status_code)
+            http_requests_in_flight.dec(method=method, route=route)
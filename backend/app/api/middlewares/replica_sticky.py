@@ -0,0 +1,36 @@
+# Starlette imports
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+# Local imports
+from app.db.replicas import REPLICA_STICKY_COOKIE, replica_router
+
+
+class ReplicaStickyMiddleware:
+    """
+        Pure ASGI middleware returning the read-your-writes window in a cookie.
+
+        Requests that opened a session on the primary are flagged in their
+        state by `get_async_db`. Their response sets the sticky cookie to the
+        end of the window, counted from when the response starts (after the
+        commit), so the next reads of the client go to the primary on every
+        worker. It works whatever response class the endpoint returns.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http" or not replica_router.replicas:
+            await self.app(scope, receive, send)
+            return
+        state = scope.setdefault("state", {})
+
+        async def send_wrapper(message: Message):
+            if message["type"] == "http.response.start" and state.get("primary"):
+                max_age = int(replica_router.sticky_seconds) + 1
+                MutableHeaders(scope=message).append(
+                    "Set-Cookie", f"{REPLICA_STICKY_COOKIE}={replica_router.sticky_until()}; "
+                                  f"Max-Age={max_age}; Path=/; HttpOnly; SameSite=lax")
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
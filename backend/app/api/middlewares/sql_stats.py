@@ -0,0 +1,68 @@
+import json
+import random
+# Starlette imports
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+# Local imports
+from app.db.instrumentation import (
+    SQL_NPLUSONE_THRESHOLD, SQL_STATS_DEBUG, SQL_STATS_SAMPLE_RATE, RequestStats, request_stats)
+from app.utils.database import logger
+from .metrics import route_template
+
+
+class SQLStatsMiddleware:
+    """
+        Pure ASGI middleware counting the SQL statements and the database
+        time of a sample of the requests.
+
+        The stats are sent in a `Server-Timing: db` header (statements run
+        before the response starts) and in a JSON log line once the request
+        ends. In debug mode the statements run more than the N+1 threshold
+        are logged as a warning.
+    """
+
+    def __init__(self, app: ASGIApp, sample_rate: float = SQL_STATS_SAMPLE_RATE,
+                 debug: bool = SQL_STATS_DEBUG, threshold: int = SQL_NPLUSONE_THRESHOLD):
+        self.app = app
+        self.sample_rate = sample_rate
+        self.debug = debug
+        self.threshold = threshold
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http" or random.random() >= self.sample_rate:
+            await self.app(scope, receive, send)
+            return
+        stats = RequestStats(self.debug)
+        token = request_stats.set(stats)
+        status_code = 500
+
+        async def send_wrapper(message: Message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                headers = MutableHeaders(scope=message)
+                headers.append(
+                    "Server-Timing", f'db;dur={stats.seconds * 1000:.2f};desc="{stats.statements} queries"')
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            request_stats.reset(token)
+            route = route_template(scope)
+            logger.info(json.dumps({
+                "event": "sql_stats",
+                "method": scope["method"],
+                "route": route,
+                "status": status_code,
+                "statements": stats.statements,
+                "db_ms": round(stats.seconds * 1000, 2),
+            }))
+            for statement, count in stats.repeated(self.threshold):
+                logger.warning(json.dumps({
+                    "event": "sql_repeated_statement",
+                    "method": scope["method"],
+                    "route": route,
+                    "count": count,
+                    "statement": statement,
+                }))
@@ -1,9 +1,11 @@
 # FastAPI imports
 from fastapi import APIRouter
 # Local imports
-from app.api.versions.v1.routes import dog, user
+from app.api.versions.v1.routes import dog, monitoring, tasks, user
 
 api_route = APIRouter()
 
 api_route.include_router(dog.router, prefix="/dog", tags=["dog"])
 api_route.include_router(user.router, prefix="/user", tags=["user"])
+api_route.include_router(tasks.router, prefix="/tasks", tags=["tasks"])
+api_route.include_router(monitoring.router, prefix="/monitoring", tags=["monitoring"])
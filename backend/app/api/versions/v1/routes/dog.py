@@ -1,24 +1,36 @@
-import httpx
 # FastAPI imports
-from fastapi import APIRouter, HTTPException, Depends, Query, status
-from fastapi.responses import JSONResponse
+from fastapi import APIRouter, Body, Depends, Header, Query, Request, Response, status
+from fastapi.responses import JSONResponse, ORJSONResponse, StreamingResponse
 # Typing imports
-from typing import List, Any
+from typing import List, Any, Optional
 # Local imports
-from app.utils.database import get_db
-from app.schemas.dog import DogResponse, DogCreate, DogUpdate
+from app.utils.database import get_async_db, get_read_db
+from app.utils.pagination import NEXT_CURSOR_HEADER, next_cursor
+from app.utils.serialization import FAST_SERIALIZATION, parse_fields
+from app.schemas.dog import DogResponse, DogCreate, DogUpdate, DogBulkUpdate, DogBulkResult
 from app.services.crud.dog import dog_service
-from app.api.middlewares.jwt_bearer import oauth2_scheme
+from app.services.changes import change_feed
+from app.services.crud.crud_service import BULK_BATCH_SIZE
+from app.schemas.token import UserPrincipal
+from app.api.middlewares.jwt_bearer import get_current_user
 
 router = APIRouter()
 
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+SSE_MEDIA_TYPE = "text/event-stream"
+# Header with the ID of the background task of a created dog, see /v1/tasks
+TASK_ID_HEADER = "X-Task-ID"
+
 
 @router.get("/", status_code=status.HTTP_200_OK, response_model=List[DogResponse])
 async def read_all(
         *,
-        db_session=Depends(get_db),
+        db_session=Depends(get_read_db),
+        response: Response,
         skip: int = Query(0, description="Number of registers to skip."),
-        limit: int = Query(10, description="Maximum number of registers to retrieve.")):
+        limit: int = Query(10, description="Maximum number of registers to retrieve."),
+        cursor: Optional[str] = Query(None, description="Cursor of the page to retrieve, taken from the X-Next-Cursor header."),
+        fields: Optional[str] = Query(None, description="Comma separated fields to return, e.g. id,name. The id is always returned.")):
     """
         Endpoint to retrieve a list of dogs with optional pagination.
 
@@ -28,18 +40,55 @@ async def read_all(
         Params:
         - skip: Number of registers to skip.
         - limit: Maximum number of registers to retrieve.
+        - cursor: Cursor of the page to retrieve, replaces skip when given.
+        - fields: Sparse fieldset, only these columns are read from the database.
 
         Returns:
-        - List of retrieved dogs(DogResponse).
+        - List of retrieved dogs(DogResponse), the X-Next-Cursor header holds the next_cursor.
     """
-    db_dogs = dog_service.read_all(db_session, skip, limit)
-    return db_dogs
+    selected = parse_fields(fields, DogResponse)
+    rows = FAST_SERIALIZATION or selected is not None
+    if rows:
+        db_dogs = await dog_service.read_all_rows(db_session, skip, limit, cursor, selected)
+        # The rows are returned as they are, skipping the response model
+        # validation, which would also reject the partial rows of a fieldset
+        response = ORJSONResponse(db_dogs)
+    else:
+        db_dogs = await dog_service.read_all(db_session, skip, limit, cursor)
+    cursor_next = next_cursor(db_dogs, limit)
+    if cursor_next:
+        response.headers[NEXT_CURSOR_HEADER] = cursor_next
+    return response if rows else db_dogs
+
+
+@router.get("/changes", status_code=status.HTTP_200_OK, response_class=StreamingResponse)
+async def read_changes(
+        last_event_id: Optional[str] = Header(None, description="ID of the last event received, to resume from it.")):
+    """
+        Endpoint to follow the dog changes as Server-Sent Events, instead of
+        polling the list endpoints.
+
+        Each event has the operation as type (created, updated or deleted)
+        and a JSON payload with the dog `id` and, except for the bulk
+        endpoints, its state after the write as `dog`. A `reset` event means
+        changes were missed and the dogs must be read again. Slow clients are
+        disconnected and resume from their Last-Event-ID.
+
+        Params:
+        - last_event_id: Last-Event-ID header, sent by EventSource when reconnecting.
+
+        Returns:
+        - text/event-stream of the changes.
+    """
+    return StreamingResponse(
+        change_feed.stream(last_event_id), media_type=SSE_MEDIA_TYPE,
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
 
 
 @router.get("/{dog_id}", status_code=status.HTTP_200_OK, response_model=DogResponse)
 async def read_dog(
         *,
-        db_session=Depends(get_db),
+        db_session=Depends(get_read_db),
         dog_id: int):
     """
         Endpoint to retrieve a dog by ID.
@@ -53,14 +102,14 @@ async def read_dog(
         Returns:
         - DogResponse.
     """
-    db_dog = dog_service.read_by_id(db_session, dog_id)
+    db_dog = await dog_service.read_by_id(db_session, dog_id)
     return db_dog
 
 
 @router.get("/name/{dog_name}", status_code=status.HTTP_200_OK, response_model=DogResponse)
 async def read_name(
         *,
-        db_session=Depends(get_db),
+        db_session=Depends(get_read_db),
         dog_name: str):
     """
         Endpoint to retrieve a dog by name.
@@ -74,15 +123,18 @@ async def read_name(
         Returns:
         - DogResponse.
     """
-    db_dog = dog_service.read_by_name(db_session, dog_name.lower())
+    db_dog = await dog_service.read_by_name(db_session, dog_name.lower())
     return db_dog
 
 
-@router.get("/is_adopted/", status_code=status.HTTP_200_OK, response_model=List[DogResponse])
+@router.get("/is_adopted/", status_code=status.HTTP_200_OK, response_model=List[DogResponse],
+            responses={200: {"content": {NDJSON_MEDIA_TYPE: {}}}})
 async def read_adopted(
         *,
-        db_session=Depends(get_db),
-        is_adopted: bool = Query(True, description="Filter by adopted status.")):
+        db_session=Depends(get_read_db),
+        request: Request,
+        is_adopted: bool = Query(True, description="Filter by adopted status."),
+        stream: bool = Query(False, description="Stream the dogs as NDJSON, one per line.")):
     """
         Endpoint to retrieve a list of adopted dogs.
 
@@ -91,22 +143,30 @@ async def read_adopted(
 
         Params:
         - is_adopted: Filter by adopted status(bool).
+        - stream: Stream the result as NDJSON, also enabled by `Accept: application/x-ndjson`.
 
         Returns:
-        - List of retrieved dogs(DogResponse).
+        - List of retrieved dogs(DogResponse), or one DogResponse per line when streaming.
     """
-    db_dogs = dog_service.read_all_adopted(db_session, is_adopted)
+    if stream or NDJSON_MEDIA_TYPE in request.headers.get("accept", ""):
+        return StreamingResponse(
+            dog_service.stream_all_adopted(is_adopted, bind=db_session.bind), media_type=NDJSON_MEDIA_TYPE)
+    if FAST_SERIALIZATION:
+        return ORJSONResponse(await dog_service.read_all_adopted_rows(db_session, is_adopted))
+    db_dogs = await dog_service.read_all_adopted(db_session, is_adopted)
     return db_dogs
 
 
 @router.post("/", status_code=status.HTTP_201_CREATED, response_model=DogResponse)
 async def create_dog(
         *,
-        db_session=Depends(get_db),
-        current_user: str = Depends(oauth2_scheme),
+        db_session=Depends(get_async_db),
+        current_user: UserPrincipal = Depends(get_current_user),
+        response: Response,
         dog_in: DogCreate):
     """
-        Endpoint to create a dog.
+        Endpoint to create a dog, its picture comes from the prefetched
+        reservoir or is set in the background.
 
         Depencencies:
         - db_session: Database session.
@@ -116,27 +176,86 @@ async def create_dog(
         - dog_in: DogResponse.
 
         Returns:
-        - DogResponse.
+        - DogResponse, with picture_pending=True while the picture is set in the background.
+          The X-Task-ID header holds the ID of its background task.
     """
-    db_dog = dog_service.create(db_session, dog_in)
-    async with httpx.AsyncClient() as client:
-        try:
-            response = await client.get("https://dog.ceo/api/breeds/image/random")
-            response.raise_for_status()
-            db_dog.picture = response.json()["message"]
-            db_session.commit()
-        except httpx.HTTPError as e:
-            raise HTTPException(
-                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
-                detail=f"Error getting image: {e}",
-            )
+    db_dog = await dog_service.create(db_session, dog_in)
+    response.headers[TASK_ID_HEADER] = db_dog.task_id
     return db_dog
 
 
+@router.post("/bulk", status_code=status.HTTP_201_CREATED, response_model=List[DogBulkResult])
+async def bulk_create_dogs(
+        *,
+        db_session=Depends(get_async_db),
+        current_user: UserPrincipal = Depends(get_current_user),
+        dogs_in: List[DogCreate],
+        batch_size: int = Query(BULK_BATCH_SIZE, ge=1, description="Number of dogs per INSERT statement.")):
+    """
+        Endpoint to create many dogs in a single transaction.
+
+        Depencencies:
+        - db_session: Database session.
+        - current_user: authentication.
+
+        Params:
+        - dogs_in: List of DogCreate.
+        - batch_size: Number of dogs per INSERT statement.
+
+        Returns:
+        - List of DogBulkResult, one per dog in input order, with the ID of its background task.
+    """
+    return await dog_service.bulk_create(db_session, dogs_in, batch_size)
+
+
+@router.put("/bulk", status_code=status.HTTP_200_OK, response_model=List[DogBulkResult])
+async def bulk_update_dogs(
+        *,
+        db_session=Depends(get_async_db),
+        dogs_in: List[DogBulkUpdate],
+        batch_size: int = Query(BULK_BATCH_SIZE, ge=1, description="Number of dogs per UPDATE statement.")):
+    """
+        Endpoint to update many dogs by ID in a single transaction.
+
+        Depencencies:
+        - db_session: Database session.
+
+        Params:
+        - dogs_in: List of DogBulkUpdate.
+        - batch_size: Number of dogs per UPDATE statement.
+
+        Returns:
+        - List of DogBulkResult, `updated` or `not_found` for each dog.
+    """
+    return await dog_service.bulk_update(db_session, dogs_in, batch_size)
+
+
+@router.delete("/bulk", status_code=status.HTTP_200_OK, response_model=List[DogBulkResult])
+async def bulk_delete_dogs(
+        *,
+        db_session=Depends(get_async_db),
+        dog_ids: List[int] = Body(...),
+        batch_size: int = Query(BULK_BATCH_SIZE, ge=1, description="Number of dogs per DELETE statement.")):
+    """
+        Endpoint to delete many dogs by ID in a single transaction.
+
+        Depencencies:
+        - db_session: Database session.
+
+        Params:
+        - dog_ids: List of dog IDs.
+        - batch_size: Number of dogs per DELETE statement.
+
+        Returns:
+        - List of DogBulkResult, `deleted` or `not_found` for each dog.
+    """
+    return await dog_service.bulk_delete(db_session, dog_ids, batch_size)
+
+
 @router.put("/{dog_id}", status_code=status.HTTP_200_OK, response_model=DogResponse)
 async def update_dog(
         *,
-        db_session=Depends(get_db),
+        db_session=Depends(get_async_db),
         dog_id: int,
         dog_in: DogUpdate):
     """
@@ -152,14 +271,14 @@ async def update_dog(
         Returns:
         - DogResponse.
     """
-    db_dog = dog_service.update(db_session, dog_id, dog_in)
+    db_dog = await dog_service.update(db_session, dog_id, dog_in)
     return db_dog
 
 
 @router.put("/name/{dog_name}", status_code=status.HTTP_200_OK, response_model=DogResponse)
 async def update_dog_by_name(
         *,
-        db_session=Depends(get_db),
+        db_session=Depends(get_async_db),
         dog_name: str,
         dog_in: DogUpdate):
     """
@@ -175,14 +294,14 @@ async def update_dog_by_name(
         Returns:
         - DogResponse.
     """
-    db_dog = dog_service.update_by_name(db_session, dog_name.lower(), dog_in)
+    db_dog = await dog_service.update_by_name(db_session, dog_name.lower(), dog_in)
     return db_dog
 
 
 @router.delete("/{dog_id}", status_code=status.HTTP_200_OK, response_model=Any)
 async def delete_by_id(
         *,
-        db_session=Depends(get_db),
+        db_session=Depends(get_async_db),
         dog_id: int):
     """
         Endpoint to delete a dog.
@@ -196,7 +315,7 @@ async def delete_by_id(
         Returns:
         - JSON: msj.
     """
-    db_dog = dog_service.delete(db_session, dog_id)
+    db_dog = await dog_service.delete(db_session, dog_id)
     return JSONResponse(status_code=status.HTTP_200_OK, content={
         'detail': 'Dog deleted'
     })
@@ -205,7 +324,7 @@ async def delete_by_id(
 @router.delete("/name/{dog_name}", status_code=status.HTTP_200_OK, response_model=Any)
 async def delete_by_name(
         *,
-        db_session=Depends(get_db),
+        db_session=Depends(get_async_db),
         dog_name: str):
     """
         Endpoint to delete a dog by name.
@@ -219,7 +338,7 @@ async def delete_by_name(
         Returns:
         - Any.
     """
-    db_dog = dog_service.delete_by_name(db_session, dog_name.lower())
+    db_dog = await dog_service.delete_by_name(db_session, dog_name.lower())
     return JSONResponse(status_code=status.HTTP_200_OK, content={
         'detail': 'Dog deleted'
     })
@@ -0,0 +1,49 @@
+# FastAPI imports
+from fastapi import APIRouter, status
+from fastapi.responses import PlainTextResponse
+# Typing imports
+from typing import Any
+# Local imports
+from app.db.database import (
+    async_engine, async_pool_metrics, engine, pool_metrics, replica_engines, replica_pool_metrics)
+from app.db.replicas import replica_router
+from app.services.metrics import registry
+from app.services.metrics import collectors  # noqa: F401, registers the pool and cache metrics
+
+router = APIRouter()
+# Served at the root, where Prometheus scrapes by default
+metrics_router = APIRouter()
+
+
+@router.get("/pool", status_code=status.HTTP_200_OK, response_model=Any)
+async def read_pool():
+    """
+        Endpoint to read the database connection pool metrics.
+
+        Returns:
+        - pools: Checked out, idle and overflow connections, event counters
+          and connection wait times of the API (async), the sync and the
+          replica engines, with the health of the replicas.
+    """
+    return {
+        "async": async_pool_metrics.snapshot(async_engine.sync_engine.pool),
+        "sync": pool_metrics.snapshot(engine.pool),
+        "replicas": [
+            metrics.snapshot(replica.sync_engine.pool)
+            for replica, metrics in zip(replica_engines, replica_pool_metrics)],
+        "replication": replica_router.stats(),
+    }
+
+
+@metrics_router.get("/metrics", status_code=status.HTTP_200_OK, response_class=PlainTextResponse,
+                    include_in_schema=False)
+async def read_metrics():
+    """
+        Endpoint to read the service metrics in the Prometheus text format.
+
+        Returns:
+        - metrics: Per route request counts, latency histograms, in-flight
+          requests and status codes, Celery publish and dog picture API
+          latencies, connection pool and cache counters.
+    """
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
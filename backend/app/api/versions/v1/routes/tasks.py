@@ -0,0 +1,67 @@
+# FastAPI imports
+from fastapi import APIRouter, HTTPException, Path, Query, status
+# Typing imports
+from typing import List
+# Local imports
+from app.schemas.task import TaskStatus
+from app.services.tasks import task_results
+from app.services.tasks.results import TASK_MAX_WAIT_SECONDS
+
+router = APIRouter()
+# Maximum number of task IDs per batched request
+MAX_TASK_IDS = 100
+
+
+@router.get("/", status_code=status.HTTP_200_OK, response_model=List[TaskStatus])
+async def read_tasks(
+        task_id: List[str] = Query(..., description="IDs of the tasks, repeat the parameter for each one."),
+        wait: float = Query(0, ge=0, le=TASK_MAX_WAIT_SECONDS,
+                            description="Seconds to wait for all the tasks to finish.")):
+    """
+        Endpoint to get the status of many background tasks at once.
+
+        With a Redis result backend a waiting request returns as soon as the
+        last task finishes. Other backends are polled, up to
+        TASK_POLL_MAX_SECONDS (0.25s by default) late.
+
+        Params:
+        - task_id: IDs of the tasks, e.g. ?task_id=a&task_id=b.
+        - wait: Long-polling, seconds to wait for all the tasks to finish before returning.
+
+        Returns:
+        - List of TaskStatus, in the order of the task IDs.
+
+        Raises:
+        - HTTPException 400 Bad Request: If more than 100 task IDs are given.
+        - HTTPException 503 Service Unavailable: If no Celery result backend is configured.
+    """
+    if len(task_id) > MAX_TASK_IDS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail=f"At most {MAX_TASK_IDS} task IDs per request")
+    return await task_results.get(task_id, wait)
+
+
+@router.get("/{task_id}", status_code=status.HTTP_200_OK, response_model=TaskStatus)
+async def read_task(
+        task_id: str = Path(..., description="ID of the task."),
+        wait: float = Query(0, ge=0, le=TASK_MAX_WAIT_SECONDS,
+                            description="Seconds to wait for the task to finish.")):
+    """
+        Endpoint to get the status of a background task, e.g. the task of a created dog.
+
+        With a Redis result backend a waiting request returns as soon as the
+        task finishes. Other backends are polled, up to TASK_POLL_MAX_SECONDS
+        (0.25s by default) late.
+
+        Params:
+        - task_id: ID of the task, from the X-Task-ID header of the request that started it.
+        - wait: Long-polling, seconds to wait for the task to finish before returning.
+
+        Returns:
+        - TaskStatus, PENDING while the task is queued or running, and for unknown task IDs.
+
+        Raises:
+        - HTTPException 503 Service Unavailable: If no Celery result backend is configured.
+    """
+    statuses = await task_results.get([task_id], wait)
+    return statuses[0]
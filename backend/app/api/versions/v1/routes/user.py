@@ -1,14 +1,16 @@
 import os
 # FastAPI imports
-from fastapi import APIRouter, Depends, status, Query, Path
-from fastapi.responses import JSONResponse
+from fastapi import APIRouter, Depends, status, Query, Path, Response
+from fastapi.responses import JSONResponse, ORJSONResponse
 from fastapi.security import OAuth2PasswordRequestForm
 # Typing imports
-from typing import List, Any
+from typing import List, Any, Optional
 # dotenv imports
 from dotenv import load_dotenv
 # Local imports
-from app.utils.database import get_db
+from app.utils.database import get_async_db, get_read_db
+from app.utils.pagination import NEXT_CURSOR_HEADER, next_cursor
+from app.utils.serialization import FAST_SERIALIZATION, parse_fields
 from app.schemas.user import UserResponse, UserUpdate, UserCreate
 from app.schemas.token import Token
 from app.services.crud.user import user_service
@@ -23,28 +25,44 @@ ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES"))
 @router.get("/", status_code=status.HTTP_200_OK, response_model=List[UserResponse])
 async def read_all(
         *,
-        db_session=Depends(get_db),
+        db_session=Depends(get_read_db),
+        response: Response,
         skip: int = Query(0, ge=0),
-        limit: int = Query(10, ge=1, le=100)):
+        limit: int = Query(10, ge=1, le=100),
+        cursor: Optional[str] = Query(None),
+        fields: Optional[str] = Query(None, description="Comma separated fields to return, e.g. id,name. The id is always returned.")):
     """
         Endpoint to read all users.
 
         Params:
         - skip: Number of users to skip (non-negative integer)
         - limit: Number of users to read and return (between 1 and 100)
+        - cursor: Cursor of the page to read (X-Next-Cursor of the previous page), replaces skip
+        - fields: Sparse fieldset, only these columns are read and the dogs only when "dog" is given
         Dependencies:
         - db_session: SQLAlchemy database session.
         Returns:
-        - users: List of UserResponse
+        - users: List of UserResponse, the X-Next-Cursor header holds the next_cursor
     """
-    db_users = user_service.read_all(db_session, skip, limit)
-    return db_users
+    selected = parse_fields(fields, UserResponse)
+    rows = FAST_SERIALIZATION or selected is not None
+    if rows:
+        db_users = await user_service.read_all_rows(db_session, skip, limit, cursor, selected)
+        # The rows are returned as they are, skipping the response model
+        # validation, which would also reject the partial rows of a fieldset
+        response = ORJSONResponse(db_users)
+    else:
+        db_users = await user_service.read_all(db_session, skip, limit, cursor)
+    cursor_next = next_cursor(db_users, limit)
+    if cursor_next:
+        response.headers[NEXT_CURSOR_HEADER] = cursor_next
+    return response if rows else db_users
 
 
 @router.get("/{user_id}", status_code=status.HTTP_200_OK, response_model=UserResponse)
 async def read_user(
         *,
-        db_session=Depends(get_db),
+        db_session=Depends(get_read_db),
         user_id: int = Path(..., title="The ID of the user to retrieve", gt=0)):
     """
         Endpoint to read a user by id.
@@ -56,14 +74,14 @@ async def read_user(
         Returns:
         - user: UserResponse
     """
-    db_user = user_service.read(db_session, user_id)
+    db_user = await user_service.read(db_session, user_id)
     return db_user
 
 
 @router.post("/", status_code=status.HTTP_201_CREATED, response_model=UserResponse)
 async def create_user(
         *,
-        db_session=Depends(get_db),
+        db_session=Depends(get_async_db),
         user_in: UserCreate):
     """
         Endpoint to create a user.
@@ -75,13 +93,13 @@ async def create_user(
         Returns:
         - user: UserResponse
     """
-    return user_service.create(db_session, user_in)
+    return await user_service.create(db_session, user_in)
 
 
 @router.put("/{user_id}", status_code=status.HTTP_200_OK, response_model=UserResponse)
 async def update_user(
         *,
-        db_session=Depends(get_db),
+        db_session=Depends(get_async_db),
         user_id: int,
         user_in: UserUpdate):
     """
@@ -95,14 +113,14 @@ async def update_user(
         Returns:
         - user: UserResponse
     """
-    db_user = user_service.update(db_session, user_id, user_in)
+    db_user = await user_service.update(db_session, user_id, user_in)
     return db_user
 
 
 @router.delete("/{user_id}", status_code=status.HTTP_200_OK, response_model=Any)
 async def delete_user(
         *,
-        db_session=Depends(get_db),
+        db_session=Depends(get_async_db),
         user_id: int):
     """
         Endpoint to delete a user.
@@ -114,7 +132,7 @@ async def delete_user(
         Returns:
         - mgs: str
     """
-    db_user = user_service.delete(db_session, user_id)
+    db_user = await user_service.delete(db_session, user_id)
     return JSONResponse(status_code=status.HTTP_200_OK, content={
         'detail': 'User deleted'
     })
@@ -123,7 +141,7 @@ async def delete_user(
 @router.post("/access-token", status_code=status.HTTP_200_OK)
 async def access_token(
         *,
-        db_session=Depends(get_db),
+        db_session=Depends(get_async_db),
         form_data: OAuth2PasswordRequestForm = Depends()):
     """
         Endpoint to obtain an access token.
@@ -134,7 +152,7 @@ async def access_token(
         Returns:
         - JSONResponse: JSON response containing the access token.
     """
-    user = jwt_token.authenticate_user(db_session, form_data.username, form_data.password)
+    user = await jwt_token.authenticate_user(db_session, form_data.username, form_data.password)
     access_token = jwt_token.create_jwt_token(data={"sub": user.email})
     return Token(access_token=access_token, token_type="bearer", expires=ACCESS_TOKEN_EXPIRE_MINUTES)
     
@@ -0,0 +1,62 @@
+"""
+    Celery configuration, loaded by `app.core.celery` with `config_from_object`.
+
+    Tasks are routed by type to named queues, so workers can be scaled per
+    queue with `-Q`. Fire-and-forget tasks set `ignore_result` on their
+    decorator and never write to the result backend.
+
+    RabbitMQ refuses to redeclare an existing queue with other arguments, so
+    the `default` queue keeps no arguments and only the `events` queue,
+    new with priorities, is declared with `x-max-priority`.
+"""
+import os
+# Kombu imports
+from kombu import Exchange, Queue
+# dotenv imports
+from dotenv import load_dotenv
+
+load_dotenv()
+# Queues
+DEFAULT_QUEUE = "default"
+EVENTS_QUEUE = "events"
+# Highest message priority of the events queue, RabbitMQ only orders messages
+# up to this value
+MAX_PRIORITY = 10
+
+broker_url = os.getenv("CELERY_BROKER_URL")
+result_backend = os.getenv("CELERY_RESULT_BACKEND")
+# Modules the worker imports to register the tasks
+imports = ("app.core.tasks",)
+
+task_serializer = "json"
+result_serializer = "json"
+accept_content = ["json"]
+# Stored results are only kept for clients polling them
+result_expires = int(os.getenv("CELERY_RESULT_EXPIRES_SECONDS", "3600"))
+
+# Routing
+task_queues = (
+    Queue(DEFAULT_QUEUE, Exchange(DEFAULT_QUEUE), routing_key=DEFAULT_QUEUE),
+    Queue(EVENTS_QUEUE, Exchange(EVENTS_QUEUE), routing_key=EVENTS_QUEUE,
+          queue_arguments={"x-max-priority": MAX_PRIORITY}),
+)
+task_default_queue = DEFAULT_QUEUE
+task_default_exchange = DEFAULT_QUEUE
+task_default_routing_key = DEFAULT_QUEUE
+task_routes = {
+    # Events of changes to the dogs, fire and forget
+    "app.core.tasks.delay_task": {"queue": EVENTS_QUEUE, "routing_key": EVENTS_QUEUE, "priority": 3},
+    # Batches of those events, below single events not to delay them
+    "app.core.tasks.delay_batch_task": {"queue": EVENTS_QUEUE, "routing_key": EVENTS_QUEUE, "priority": 2},
+}
+
+# Worker
+# Acknowledge after the task ran so a crashed worker does not lose it, tasks
+# must then be safe to run twice
+task_acks_late = True
+task_reject_on_worker_lost = True
+# Tasks reserved per worker process, 1 keeps long tasks from piling up
+# behind a busy process while others are idle
+worker_prefetch_multiplier = int(os.getenv("CELERY_PREFETCH_MULTIPLIER", "1"))
+# Worker processes, 0 for the number of CPUs
+worker_concurrency = int(os.getenv("CELERY_WORKER_CONCURRENCY", "0"))
@@ -1,14 +1,95 @@
+import os
 import time
+# Celery Imports
+from celery import states
+# Typing Imports
+from typing import List, Optional
+# dotenv Imports
+from dotenv import load_dotenv
 # Local Imports
 from app.core.celery import celery
+from app.db.database import SessionLocal
+from app.models.dog import Dog
 
-@celery.task(name="app.core.tasks.delay_task")
-def delay_task():
+load_dotenv()
+# Simulated duration of the work, paid once per message
+DELAY_TASK_SECONDS = float(os.getenv("DELAY_TASK_SECONDS", "5"))
+# Retries of the items of a batch that failed, with exponential backoff
+BATCH_TASK_MAX_RETRIES = int(os.getenv("BATCH_TASK_MAX_RETRIES", "3"))
+
+
+def _delay(dog: Dog) -> str:
+    """
+        Work done for a created dog, inside the transaction of its batch.
+    """
+    return "Task Complete"
+
+
+@celery.task(name="app.core.tasks.delay_task", ignore_result=True)
+def delay_task(dog_id: Optional[int] = None):
     """
         Simulate a delay task.
 
+        Args:
+        - dog_id (int): ID of the created dog.
+
         Returns:
         - A string indicating the task is complete.
     """
-    time.sleep(5)
-    return "Task Complete"
\ No newline at end of file
+    time.sleep(DELAY_TASK_SECONDS)
+    return "Task Complete"
+
+
+@celery.task(name="app.core.tasks.delay_batch_task", bind=True, ignore_result=True,
+             max_retries=BATCH_TASK_MAX_RETRIES)
+def delay_batch_task(self, items: List[dict]):
+    """
+        Run the delay task of many dogs in one message and one transaction.
+
+        The dogs are read with one query and each one is processed in its
+        own savepoint, so a failing dog does not roll the others back. The
+        result of every item is stored under its own task ID, as if it had
+        been sent alone, after the transaction commits. Failed items, and
+        only them, are retried, without the simulated delay again.
+
+        Args:
+        - items: Dicts with the `task_id` and the `dog_id` of each dog.
+
+        Returns:
+        - Number of items processed.
+    """
+    # The work is simulated once per item, retries only redo the failed items
+    if not self.request.retries:
+        time.sleep(DELAY_TASK_SECONDS)
+    results = []
+    failed = []
+    with SessionLocal() as db, db.begin():
+        dog_ids = [item["dog_id"] for item in items]
+        dogs = {dog.id: dog for dog in db.query(Dog).filter(Dog.id.in_(dog_ids))}
+        for item in items:
+            dog = dogs.get(item["dog_id"])
+            if dog is None:
+                results.append((item["task_id"], LookupError(f"Dog {item['dog_id']} not found"), states.FAILURE))
+                continue
+            try:
+                with db.begin_nested():
+                    result = _delay(dog)
+            except Exception as e:
+                failed.append((item, e))
+                continue
+            results.append((item["task_id"], result, states.SUCCESS))
+    # Stored once committed, so no client sees a success that is rolled back
+    for task_id, result, state in results:
+        self.backend.store_result(task_id, result, state)
+    if failed and self.request.retries < self.max_retries:
+        raise self.retry(kwargs={"items": [item for item, _ in failed]},
+                         countdown=2 ** self.request.retries)
+    for item, e in failed:
+        self.backend.store_result(item["task_id"], e, states.FAILURE)
+    return len(items)
+
+
+# Tasks the outbox relay merges into one message of their batch task
+BATCH_TASKS = {
+    delay_task.name: delay_batch_task.name,
+}
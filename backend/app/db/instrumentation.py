@@ -0,0 +1,69 @@
+import os
+import time
+from collections import Counter
+from contextvars import ContextVar
+# SQLAlchemy imports
+from sqlalchemy import event
+# Typing imports
+from typing import Optional
+# dotenv imports
+from dotenv import load_dotenv
+
+load_dotenv()
+# Fraction of the requests whose SQL statements are counted and timed
+SQL_STATS_SAMPLE_RATE = float(os.getenv("SQL_STATS_SAMPLE_RATE", 1.0))
+# Also count the statements by shape to flag N+1 queries
+SQL_STATS_DEBUG = os.getenv("SQL_STATS_DEBUG", "false").lower() == "true"
+# A request running the same statement more times than this is flagged
+SQL_NPLUSONE_THRESHOLD = int(os.getenv("SQL_NPLUSONE_THRESHOLD", 5))
+
+
+class RequestStats:
+    """
+        SQL statements run while serving one request.
+    """
+
+    def __init__(self, debug: bool = False):
+        self.statements = 0
+        self.seconds = 0.0
+        # Statement text (with bind placeholders, so one per shape) -> count
+        self.shapes: Optional[Counter] = Counter() if debug else None
+
+    def repeated(self, threshold: int):
+        """
+            Return the statement shapes run more than `threshold` times, with their count.
+        """
+        if self.shapes is None:
+            return []
+        return [(statement, count) for statement, count in self.shapes.most_common() if count > threshold]
+
+
+# Stats of the current request, None when the request is not sampled. The
+# object is mutated in place, so the greenlets SQLAlchemy runs the async
+# statements in (which copy the context) update the same stats.
+request_stats: ContextVar[Optional[RequestStats]] = ContextVar("request_stats", default=None)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if request_stats.get() is not None:
+        context._sql_stats_start = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = request_stats.get()
+    start = getattr(context, "_sql_stats_start", None)
+    if stats is None or start is None:
+        return
+    stats.statements += 1
+    stats.seconds += time.perf_counter() - start
+    if stats.shapes is not None:
+        stats.shapes[statement] += 1
+
+
+def instrument(engine):
+    """
+        Count and time the statements of a (sync) engine into the stats of
+        the current request.
+    """
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
@@ -0,0 +1,99 @@
+# SQLAlchemy imports
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Engine
+# Local imports
+from app.utils.database import logger
+
+
+def _add_dog_picture_pending(engine: Engine, inspector):
+    """
+        Add the dog.picture_pending column to tables created before it existed.
+    """
+    columns = {column["name"] for column in inspector.get_columns("dog")}
+    if "picture_pending" in columns:
+        return False
+    with engine.begin() as connection:
+        connection.execute(text(
+            "ALTER TABLE dog ADD COLUMN picture_pending BOOLEAN DEFAULT FALSE"))
+    return True
+
+
+def _create_index(engine: Engine, name: str, table: str, expression: str):
+    """
+        Create an index if it does not exist. On PostgreSQL the index is built
+        concurrently so writes are not blocked on big tables. A concurrent
+        build that failed leaves an invalid index behind, which IF NOT EXISTS
+        would keep, so it is dropped and built again.
+    """
+    postgresql = engine.dialect.name == "postgresql"
+    concurrently = "CONCURRENTLY " if postgresql else ""
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as connection:
+        if postgresql:
+            invalid = connection.execute(text(
+                "SELECT 1 FROM pg_index JOIN pg_class ON pg_class.oid = pg_index.indexrelid "
+                "WHERE pg_class.relname = :name AND NOT pg_index.indisvalid"), {"name": name}).first()
+            if invalid:
+                logger.warning(f"Rebuilding invalid index {name}")
+                connection.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {name}"))
+        connection.execute(text(
+            f"CREATE INDEX {concurrently}IF NOT EXISTS {name} ON {table} ({expression})"))
+
+
+def _add_dog_name_lower_index(engine: Engine, inspector):
+    """
+        Index lower(dog.name) for case-insensitive name lookups.
+    """
+    _create_index(engine, "ix_dog_name_lower", "dog", "lower(name)")
+
+
+def _add_user_email_index(engine: Engine, inspector):
+    """
+        Index user.email, used to resolve the user of every token and login.
+    """
+    _create_index(engine, "ix_user_email", '"user"', "email")
+
+
+# Key of the PostgreSQL advisory lock held while migrating
+MIGRATIONS_LOCK_KEY = 7_402_210
+
+# Ordered list of idempotent schema migrations, each one returns True when it
+# changed the schema (migrations relying on IF NOT EXISTS return None)
+MIGRATIONS = [
+    _add_dog_picture_pending,
+    _add_dog_name_lower_index,
+    _add_user_email_index,
+]
+
+
+def run_migrations(engine: Engine):
+    """
+        Bring an existing database up to date with the models.
+
+        `Base.metadata.create_all` only creates missing tables, so changes to
+        existing tables are applied here. Every migration checks the current
+        schema first and can safely run again. On PostgreSQL an advisory lock
+        keeps two deployments from migrating at the same time.
+
+        Args:
+        - engine (Engine): Sync SQLAlchemy engine.
+    """
+    postgresql = engine.dialect.name == "postgresql"
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as lock:
+        if postgresql:
+            lock.execute(text("SELECT pg_advisory_lock(:key)"), {"key": MIGRATIONS_LOCK_KEY})
+        try:
+            for migration in MIGRATIONS:
+                if migration(engine, inspect(engine)):
+                    logger.info(f"Applied migration {migration.__name__}")
+        finally:
+            if postgresql:
+                lock.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": MIGRATIONS_LOCK_KEY})
+
+
+if __name__ == "__main__":
+    # One-time deployment step, run before starting the app:
+    # python -m app.db.migrations
+    from app import models
+    from app.db.database import engine
+    models.Base.metadata.create_all(bind=engine)
+    run_migrations(engine)
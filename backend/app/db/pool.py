@@ -0,0 +1,155 @@
+import os
+import threading
+import time
+# SQLAlchemy imports
+from sqlalchemy import event, exc
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import QueuePool
+# Typing imports
+from typing import Dict, Optional
+# dotenv imports
+from dotenv import load_dotenv
+
+load_dotenv()
+# Pool settings, the size settings only apply to queue pools (not SQLite files)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", 5))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", 10))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", 30))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", 1800))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "false").lower() == "true"
+# Upper bounds, in seconds, of the connection wait time histogram
+WAIT_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0)
+
+
+class PoolMetrics:
+    """
+        Counters of a connection pool, fed by the pool events and by the
+        time spent in `Pool.connect` waiting for a connection.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.connects = 0
+        self.checkouts = 0
+        self.checkins = 0
+        self.invalidations = 0
+        self.checked_out = 0
+        self.timeouts = 0
+        self.waits = 0
+        self.wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+        self.wait_buckets = [0] * len(WAIT_BUCKETS)
+
+    def attach(self, engine):
+        """
+            Listen to the pool events of a (sync) engine.
+        """
+        event.listen(engine, "connect", self._on_connect)
+        event.listen(engine, "checkout", self._on_checkout)
+        event.listen(engine, "checkin", self._on_checkin)
+        event.listen(engine, "invalidate", self._on_invalidate)
+
+    def _on_connect(self, dbapi_connection, connection_record):
+        with self._lock:
+            self.connects += 1
+
+    def _on_checkout(self, dbapi_connection, connection_record, connection_proxy):
+        with self._lock:
+            self.checkouts += 1
+            self.checked_out += 1
+
+    def _on_checkin(self, dbapi_connection, connection_record):
+        with self._lock:
+            self.checkins += 1
+            self.checked_out -= 1
+
+    def _on_invalidate(self, dbapi_connection, connection_record, exception):
+        with self._lock:
+            self.invalidations += 1
+
+    def observe_wait(self, seconds: float, timed_out: bool = False):
+        """
+            Record the time spent waiting for a connection.
+        """
+        with self._lock:
+            self.waits += 1
+            self.wait_seconds += seconds
+            self.max_wait_seconds = max(self.max_wait_seconds, seconds)
+            if timed_out:
+                self.timeouts += 1
+            for i, bound in enumerate(WAIT_BUCKETS):
+                if seconds <= bound:
+                    self.wait_buckets[i] += 1
+
+    def snapshot(self, pool) -> Dict[str, object]:
+        """
+            Return the counters with the current state of `pool`.
+        """
+        queue_pool = isinstance(pool, QueuePool)
+        with self._lock:
+            return {
+                "pool": type(pool).__name__,
+                "size": pool.size() if queue_pool else None,
+                "checked_out": self.checked_out,
+                "idle": pool.checkedin() if queue_pool else 0,
+                "overflow": max(pool.overflow(), 0) if queue_pool else 0,
+                "connects": self.connects,
+                "checkouts": self.checkouts,
+                "checkins": self.checkins,
+                "invalidations": self.invalidations,
+                "timeouts": self.timeouts,
+                "waits": self.waits,
+                "wait_seconds_total": round(self.wait_seconds, 6),
+                "wait_seconds_max": round(self.max_wait_seconds, 6),
+                "wait_seconds_avg": round(self.wait_seconds / self.waits, 6) if self.waits else 0.0,
+                "wait_buckets": dict(zip(map(str, WAIT_BUCKETS), self.wait_buckets)),
+            }
+
+
+class TimedPool:
+    """
+        Pool mixin recording in `metrics` how long each connect() waits.
+    """
+    metrics: Optional[PoolMetrics] = None
+
+    def connect(self):
+        start = time.perf_counter()
+        try:
+            connection = super().connect()
+        except exc.TimeoutError:
+            self.metrics.observe_wait(time.perf_counter() - start, timed_out=True)
+            raise
+        self.metrics.observe_wait(time.perf_counter() - start)
+        return connection
+
+
+def engine_options(url: str, metrics: PoolMetrics) -> dict:
+    """
+        Build the engine keyword arguments for `url` from the pool settings.
+
+        The dialect's default pool class is subclassed with `TimedPool`
+        (the class is kept when the engine recreates its pool).
+
+        PgBouncer in transaction mode is not supported. SQLAlchemy 1.4.25
+        runs every asyncpg statement as a named prepared statement, even with
+        the statement caches disabled, and PgBouncer in transaction mode
+        routes them to server connections that do not have them. Connect to
+        PostgreSQL directly, or to PgBouncer in session mode.
+
+        Args:
+        - url (str): Database URL.
+        - metrics (PoolMetrics): Metrics fed by the pool.
+
+        Returns:
+        - Keyword arguments for create_engine/create_async_engine.
+    """
+    url = make_url(url)
+    pool_class = url.get_dialect().get_pool_class(url)
+    options = {
+        "poolclass": type(f"Timed{pool_class.__name__}", (TimedPool, pool_class), {"metrics": metrics}),
+        "pool_pre_ping": DB_POOL_PRE_PING,
+        "pool_recycle": DB_POOL_RECYCLE,
+    }
+    if issubclass(pool_class, QueuePool):
+        options.update(pool_size=DB_POOL_SIZE, max_overflow=DB_MAX_OVERFLOW, pool_timeout=DB_POOL_TIMEOUT)
+    return options
@@ -0,0 +1,153 @@
+import os
+import time
+import logging
+import asyncio
+import itertools
+from collections import OrderedDict
+# SQLAlchemy imports
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncEngine
+# Typing imports
+from typing import Dict, List, Optional
+# dotenv imports
+from dotenv import load_dotenv
+# Local imports
+from app.db.database import async_engine, replica_engines
+
+logger = logging.getLogger(__name__)
+
+load_dotenv()
+# Seconds between two health checks of the replicas
+REPLICA_CHECK_INTERVAL_SECONDS = float(os.getenv("REPLICA_CHECK_INTERVAL_SECONDS", 5))
+# Seconds a health check may take before the replica is considered down
+REPLICA_CHECK_TIMEOUT_SECONDS = float(os.getenv("REPLICA_CHECK_TIMEOUT_SECONDS", 1))
+# Seconds the reads of a client go to the primary after it writes
+REPLICA_STICKY_SECONDS = float(os.getenv("REPLICA_STICKY_SECONDS", 5))
+# Cookie carrying the end of the window, so every worker sees it
+REPLICA_STICKY_COOKIE = os.getenv("REPLICA_STICKY_COOKIE", "read_primary_until")
+
+
+class ReplicaRouter:
+    """
+        Routes the reads to the healthy replicas, round-robin.
+
+        A background task checks the replicas with `SELECT 1` and takes the
+        failing ones out of the rotation until they answer again. A client
+        that wrote recently reads from the primary for `sticky_seconds`, so
+        it sees its own writes whatever the replication lag. The end of that
+        window is returned to the client in a cookie, read by whichever
+        worker serves its next request, and also kept in process for the
+        clients that do not send cookies back.
+    """
+
+    def __init__(self, primary: AsyncEngine, replicas: List[AsyncEngine],
+                 check_interval: float, check_timeout: float, sticky_seconds: float):
+        self.primary = primary
+        self.replicas = replicas
+        self.check_interval = check_interval
+        self.check_timeout = check_timeout
+        self.sticky_seconds = sticky_seconds
+        self.healthy = list(replicas)
+        self._next = itertools.count()
+        # Client key -> end of its read-your-writes window, oldest first
+        self._writes: "OrderedDict[str, float]" = OrderedDict()
+        self._task: Optional[asyncio.Task] = None
+
+    def mark_write(self, client: str):
+        """
+            Start or extend the read-your-writes window of a client.
+        """
+        now = time.monotonic()
+        self._writes[client] = now + self.sticky_seconds
+        self._writes.move_to_end(client)
+        while self._writes:
+            oldest, until = next(iter(self._writes.items()))
+            if until > now:
+                break
+            del self._writes[oldest]
+
+    def sticky_until(self) -> float:
+        """
+            End of a read-your-writes window starting now, as a UNIX timestamp
+            for the sticky cookie.
+        """
+        return time.time() + self.sticky_seconds
+
+    def is_sticky(self, client: str, sticky_until: Optional[float] = None) -> bool:
+        """
+            Whether the client wrote within the last `sticky_seconds`, in this
+            process or as told by its sticky cookie.
+        """
+        if sticky_until is not None and sticky_until > time.time():
+            return True
+        until = self._writes.get(client)
+        return until is not None and until > time.monotonic()
+
+    def read_engine(self, client: str, sticky_until: Optional[float] = None) -> AsyncEngine:
+        """
+            Return the engine to serve a read of the client: the next healthy
+            replica, or the primary when the client is sticky or no replica
+            is healthy.
+        """
+        healthy = self.healthy
+        if not healthy or self.is_sticky(client, sticky_until):
+            return self.primary
+        return healthy[next(self._next) % len(healthy)]
+
+    async def _check(self, replica: AsyncEngine) -> bool:
+        try:
+            async with replica.connect() as conn:
+                await asyncio.wait_for(conn.execute(text("SELECT 1")), self.check_timeout)
+            return True
+        except Exception as e:
+            logger.warning(f"Replica {replica.url!r} failed its health check: {e}")
+            return False
+
+    async def check(self):
+        """
+            Check every replica and keep the healthy ones in the rotation.
+        """
+        results = await asyncio.gather(*(self._check(replica) for replica in self.replicas))
+        self.healthy = [replica for replica, ok in zip(self.replicas, results) if ok]
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.check_interval)
+            await self.check()
+
+    async def start(self):
+        """
+            Check the replicas once, then keep checking them in the background.
+        """
+        if self.replicas and self._task is None:
+            await self.check()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """
+            Stop the health checks and close the replica connections.
+        """
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        for replica in self.replicas:
+            await replica.dispose()
+
+    def stats(self) -> Dict[str, object]:
+        """
+            Return the replicas and their health.
+        """
+        return {
+            "replicas": len(self.replicas),
+            "healthy": len(self.healthy),
+            "sticky_clients": len(self._writes),
+        }
+
+
+replica_router = ReplicaRouter(
+    async_engine, replica_engines,
+    REPLICA_CHECK_INTERVAL_SECONDS, REPLICA_CHECK_TIMEOUT_SECONDS, REPLICA_STICKY_SECONDS)
@@ -4,12 +4,45 @@ from fastapi import FastAPI
 from . import models
 from app.utils.database import get_db
 from app.db.database import engine
+from app.db.replicas import replica_router
+from app.api.middlewares.metrics import MetricsMiddleware
+from app.api.middlewares.replica_sticky import ReplicaStickyMiddleware
+from app.api.middlewares.sql_stats import SQLStatsMiddleware
 from app.api.versions.v1.router import api_route
+from app.api.versions.v1.routes.monitoring import metrics_router
+from app.services.picture import picture_enricher, picture_provider
+from app.services.outbox import outbox_relay
+from app.services.changes import change_feed
 
 # Create the FastAPI instance
 app = FastAPI()
-# Create tables if they do not exist
+# Create tables if they do not exist, changes to existing tables are applied
+# once per deployment with `python -m app.db.migrations`
 models.Base.metadata.create_all(bind=engine)
 # Dependency to get the database session
 app.dependency_overrides[get_db] = get_db
 app.include_router(api_route, prefix="/v1")
+app.include_router(metrics_router)
+# Record per route request metrics and per request SQL stats
+app.add_middleware(SQLStatsMiddleware)
+# Return the read-your-writes window of the clients that wrote
+app.add_middleware(ReplicaStickyMiddleware)
+app.add_middleware(MetricsMiddleware)
+
+
+@app.on_event("startup")
+async def startup():
+    await replica_router.start()
+    await picture_provider.start()
+    await picture_enricher.start()
+    await outbox_relay.start()
+    await change_feed.start()
+
+
+@app.on_event("shutdown")
+async def shutdown():
+    await change_feed.stop()
+    await outbox_relay.stop()
+    await picture_enricher.stop()
+    await picture_provider.stop()
+    await replica_router.stop()
@@ -1,4 +1,5 @@
 from .dog import Dog
 from .user import User
+from .outbox import OutboxEvent
 
 from app.db.database import Base
@@ -1,5 +1,5 @@
 # SQLAlchemy imports
-from sqlalchemy import Column, Integer, DateTime, String, Boolean, ForeignKey
+from sqlalchemy import Column, Integer, DateTime, String, Boolean, ForeignKey, Index
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 # Local imports
@@ -11,8 +11,13 @@ class Dog(Base):
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String)
     picture = Column(String)
+    picture_pending = Column(Boolean, default=False)
     is_adopted = Column(Boolean)
     created_date = Column(DateTime, default=func.now())
     # Relationship
     user_id = Column(Integer, ForeignKey("user.id"))
     user = relationship("User", back_populates="dog")
+
+
+# Case-insensitive name lookups filter on lower(name)
+Index("ix_dog_name_lower", func.lower(Dog.name))
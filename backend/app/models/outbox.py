@@ -0,0 +1,19 @@
+# SQLAlchemy imports
+from sqlalchemy import Column, Integer, DateTime, String, JSON
+from sqlalchemy.sql import func
+# Local imports
+from app.db.database import Base
+
+
+class OutboxEvent(Base):
+    """
+        Celery task waiting to be published, written in the same transaction
+        as the change it reports and deleted once it reaches the broker.
+    """
+    __tablename__ = "outbox_event"
+    id = Column(Integer, primary_key=True)
+    # Assigned on write so the task can be tracked before it is published
+    task_id = Column(String(36), unique=True, nullable=False)
+    task_name = Column(String, nullable=False)
+    payload = Column(JSON, nullable=False, default=dict)
+    created_date = Column(DateTime, default=func.now())
@@ -11,8 +11,9 @@ class User(Base):
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String)
     last_name = Column(String)
-    email = Column(String)
+    email = Column(String, index=True)
     hashed_password = Column(String)
     created_date = Column(DateTime, default=func.now())
-    # Relationship
+    # Relationship, lazy loads are not allowed under AsyncSession so the
+    # queries serializing the dogs load them with their own loader options
     dog = relationship("Dog", back_populates="user")
@@ -1,3 +1,4 @@
-from .dog  import DogBase, DogCreate, DogUpdate, DogInDB, DogResponse
+from .dog  import DogBase, DogCreate, DogUpdate, DogInDB, DogResponse, DogBulkUpdate, DogBulkResult
 from .user import UserBase, UserCreate, UserUpdate, UserInDB, UserResponse
-from .token import Token, TokenPayload
\ No newline at end of file
+from .token import Token, TokenPayload, UserPrincipal
+from .task import TaskStatus
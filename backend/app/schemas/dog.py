@@ -26,6 +26,7 @@ class DogInDB(DogBase):
     id: int
     created_date: datetime
     picture: Optional[str] = None
+    picture_pending: bool = False
 
     class Config:
         orm_mode = True
@@ -33,3 +34,15 @@ class DogInDB(DogBase):
 
 class DogResponse(DogInDB):
     pass
+
+
+class DogBulkUpdate(DogUpdate):
+    id: int
+
+
+class DogBulkResult(BaseModel):
+    index: int
+    id: Optional[int] = None
+    status: str
+    # Background task of a created dog
+    task_id: Optional[str] = None
@@ -0,0 +1,15 @@
+# Pydantic imports
+from pydantic import BaseModel
+# Typing imports
+from typing import Any, Optional
+from datetime import datetime
+
+
+class TaskStatus(BaseModel):
+    task_id: str
+    # PENDING also covers unknown and expired task IDs
+    status: str
+    ready: bool
+    # Return value of the task, or the error message when it failed
+    result: Any = None
+    date_done: Optional[datetime] = None
@@ -15,3 +15,11 @@ class TokenData(BaseModel):
 
 class TokenPayload(BaseModel):
     sub: Union[int, str, None] = None
+
+
+class UserPrincipal(BaseModel):
+    id: int
+    email: str
+
+    class Config:
+        orm_mode = True
@@ -0,0 +1,225 @@
+import os
+import json
+import time
+from collections import OrderedDict
+# Redis imports
+import redis
+# Starlette imports
+from starlette.concurrency import run_in_threadpool
+# Typing imports
+from typing import Any, Dict, Optional, Tuple
+# dotenv imports
+from dotenv import load_dotenv
+# Local imports
+from app.utils.database import logger
+
+load_dotenv()
+# Set to false to disable the cache
+CACHE_ENABLED = os.getenv("CACHE_ENABLED", "true").lower() == "true"
+# Maximum number of entries kept in the in-process tier
+CACHE_MAX_SIZE = int(os.getenv("CACHE_MAX_SIZE", "1000"))
+# Maximum number of entries kept by the in-memory stand-in of the shared tier
+CACHE_SHARED_MAX_SIZE = int(os.getenv("CACHE_SHARED_MAX_SIZE", "10000"))
+# Entries live shorter in-process because other instances cannot invalidate them
+CACHE_LOCAL_TTL_SECONDS = float(os.getenv("CACHE_LOCAL_TTL_SECONDS", "5"))
+CACHE_SHARED_TTL_SECONDS = int(os.getenv("CACHE_SHARED_TTL_SECONDS", "60"))
+# Redis used as shared tier, an in-memory stand-in is used when empty
+CACHE_REDIS_URL = os.getenv("CACHE_REDIS_URL")
+CACHE_KEY_PREFIX = os.getenv("CACHE_KEY_PREFIX", "gtt")
+
+
+class LocalCache():
+    """
+        In-process LRU cache with a per-entry TTL and a size bound.
+    """
+
+    def __init__(self, max_size: int, ttl: float):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.evictions = 0
+        self._entries: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+
+    def get(self, key: str) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires, value = entry
+        if expires < time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def set(self, key: str, value: Any):
+        self._entries[key] = (time.monotonic() + self.ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def delete(self, key: str):
+        self._entries.pop(key, None)
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class MemoryStore():
+    """
+        In-memory stand-in for the Redis shared tier, used when no Redis is
+        configured and in tests. It is only shared inside the process, and
+        bounded like Redis with an eviction policy: the least recently used
+        entries are evicted past `max_size`.
+    """
+
+    def __init__(self, ttl: int, max_size: int = CACHE_SHARED_MAX_SIZE):
+        self.ttl = ttl
+        self.max_size = max_size
+        self.evictions = 0
+        self._entries: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+
+    async def get(self, key: str) -> Optional[str]:
+        entry = self._entries.get(key)
+        if entry is None or entry[0] < time.monotonic():
+            self._entries.pop(key, None)
+            return None
+        self._entries.move_to_end(key)
+        return entry[1]
+
+    async def set(self, key: str, value: str):
+        self._entries[key] = (time.monotonic() + self.ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    async def delete(self, *keys: str):
+        for key in keys:
+            self._entries.pop(key, None)
+
+
+class RedisStore():
+    """
+        Shared tier backed by Redis. The client is blocking, so calls run in
+        the thread pool to keep the event loop free.
+    """
+
+    def __init__(self, url: str, ttl: int):
+        self.ttl = ttl
+        self._client = redis.Redis.from_url(url, socket_timeout=0.5)
+
+    async def get(self, key: str) -> Optional[str]:
+        value = await run_in_threadpool(self._client.get, key)
+        return value.decode() if value is not None else None
+
+    async def set(self, key: str, value: str):
+        await run_in_threadpool(self._client.set, key, value, ex=self.ttl)
+
+    async def delete(self, *keys: str):
+        await run_in_threadpool(self._client.delete, *keys)
+
+
+class TwoTierCache():
+    """
+        Read-through cache with an in-process tier in front of a shared tier.
+
+        Values are JSON serializable dicts. A failing shared tier is treated
+        as a miss, so the database stays the source of truth.
+    """
+
+    def __init__(self, local: LocalCache, shared, prefix: str = CACHE_KEY_PREFIX, enabled: bool = CACHE_ENABLED):
+        self.local = local
+        self.shared = shared
+        self.prefix = prefix
+        self.enabled = enabled
+        self.hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+
+    def _key(self, key: str) -> str:
+        return f"{self.prefix}:{key}"
+
+    async def get(self, key: str) -> Optional[Any]:
+        """
+            Get a value, looking in the in-process tier first.
+
+            Args:
+            - key (str): Cache key, e.g. `dog:id:1`.
+
+            Returns:
+            - The cached value or None on a miss.
+        """
+        if not self.enabled:
+            return None
+        key = self._key(key)
+        value = self.local.get(key)
+        if value is not None:
+            self.hits += 1
+            return value
+        try:
+            raw = await self.shared.get(key)
+        except Exception as e:
+            logger.warning(f"Cache shared tier unavailable: {e}")
+            raw = None
+        if raw is None:
+            self.misses += 1
+            return None
+        value = json.loads(raw)
+        self.local.set(key, value)
+        self.hits += 1
+        self.shared_hits += 1
+        return value
+
+    async def set(self, key: str, value: Any):
+        """
+            Store a value in both tiers.
+
+            Args:
+            - key (str): Cache key.
+            - value: JSON serializable value.
+        """
+        if not self.enabled:
+            return
+        key = self._key(key)
+        self.local.set(key, value)
+        try:
+            await self.shared.set(key, json.dumps(value))
+        except Exception as e:
+            logger.warning(f"Cache shared tier unavailable: {e}")
+
+    async def delete(self, *keys: str):
+        """
+            Invalidate keys in both tiers.
+
+            Args:
+            - keys (str): Cache keys to remove.
+        """
+        if not self.enabled or not keys:
+            return
+        keys = [self._key(key) for key in keys]
+        for key in keys:
+            self.local.delete(key)
+        try:
+            await self.shared.delete(*keys)
+        except Exception as e:
+            logger.warning(f"Cache shared tier unavailable: {e}")
+
+    def stats(self) -> Dict[str, int]:
+        """
+            Return the cache counters.
+        """
+        return {
+            "hits": self.hits,
+            "shared_hits": self.shared_hits,
+            "misses": self.misses,
+            "evictions": self.local.evictions,
+            "size": len(self.local),
+            "max_size": self.local.max_size,
+        }
+
+
+cache = TwoTierCache(
+    local=LocalCache(CACHE_MAX_SIZE, CACHE_LOCAL_TTL_SECONDS),
+    shared=RedisStore(CACHE_REDIS_URL, CACHE_SHARED_TTL_SECONDS) if CACHE_REDIS_URL
+    else MemoryStore(CACHE_SHARED_TTL_SECONDS),
+)
@@ -0,0 +1 @@
+from .feed import change_feed
@@ -0,0 +1,282 @@
+import os
+import json
+import uuid
+import asyncio
+from collections import deque
+# SQLAlchemy imports
+from sqlalchemy import event, text
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+# Typing imports
+from typing import AsyncIterator, Deque, List, Optional, Sequence, Set, Tuple
+# dotenv imports
+from dotenv import load_dotenv
+# Local imports
+from app.db.database import async_engine
+from app.utils.database import logger
+
+load_dotenv()
+# PostgreSQL channel of the dog changes
+CHANGES_CHANNEL = "dog_changes"
+# Session info key of the changes waiting for their commit on other databases
+CHANGES_PENDING_KEY = "dog_changes"
+# Recent events kept to resume subscribers from their Last-Event-ID
+CHANGES_BUFFER_SIZE = int(os.getenv("CHANGES_BUFFER_SIZE", "1000"))
+# Events queued per subscriber before it is disconnected as too slow
+CHANGES_QUEUE_SIZE = int(os.getenv("CHANGES_QUEUE_SIZE", "100"))
+# Seconds between keep-alive comments on idle streams
+CHANGES_HEARTBEAT_SECONDS = float(os.getenv("CHANGES_HEARTBEAT_SECONDS", "15"))
+# Delay before reconnecting the listener, doubled up to 30 seconds
+CHANGES_RECONNECT_SECONDS = float(os.getenv("CHANGES_RECONNECT_SECONDS", "1"))
+
+# Event sent instead of the missed ones when they can not be replayed, the
+# subscriber must read the dogs again
+RESET = "reset"
+
+
+class Subscriber():
+    """
+        Queue of the events of one change feed client.
+    """
+
+    def __init__(self, size: int):
+        self.queue: asyncio.Queue = asyncio.Queue(size)
+
+    def put(self, event: Optional[Tuple[str, str, str]]) -> bool:
+        """
+            Queue an event, or None to end the stream. Returns False when the queue is full.
+        """
+        try:
+            self.queue.put_nowait(event)
+            return True
+        except asyncio.QueueFull:
+            return False
+
+    def close(self):
+        """
+            End the stream, dropping the queued events.
+        """
+        while not self.queue.empty():
+            self.queue.get_nowait()
+        self.queue.put_nowait(None)
+
+
+class ChangeFeed():
+    """
+        Fan out of the dog changes to any number of subscribers.
+
+        Writes send a notification in their own transaction, so it is only
+        delivered if they commit. On PostgreSQL it is sent with pg_notify and
+        one shared LISTEN connection per process receives the notifications
+        of every process, so no subscriber polls the database. Other
+        databases only have a single process, and notifications are kept on
+        the session and dispatched in process after its commit.
+
+        Every event gets an ID made of the process epoch and a sequence
+        number, the last CHANGES_BUFFER_SIZE events are kept to resume a
+        subscriber reconnecting with its Last-Event-ID. A subscriber whose
+        queue fills up is disconnected, it resumes from where it stopped.
+    """
+
+    def __init__(self, buffer_size: int = CHANGES_BUFFER_SIZE, queue_size: int = CHANGES_QUEUE_SIZE):
+        self.queue_size = queue_size
+        self.epoch = uuid.uuid4().hex[:8]
+        self._sequence = 0
+        self._buffer: Deque[Tuple[int, str, str]] = deque(maxlen=buffer_size)
+        self._subscribers: Set[Subscriber] = set()
+        self._listener: Optional[asyncio.Task] = None
+        self.dropped = 0
+
+    @property
+    def postgresql(self) -> bool:
+        return async_engine.dialect.name == "postgresql"
+
+    async def start(self):
+        """
+            Start the shared listener on PostgreSQL.
+        """
+        if self.postgresql:
+            self._listener = asyncio.create_task(self._listen())
+
+    async def stop(self):
+        """
+            Stop the listener and end the stream of every subscriber.
+        """
+        if self._listener is not None:
+            self._listener.cancel()
+            await asyncio.gather(self._listener, return_exceptions=True)
+            self._listener = None
+        for subscriber in list(self._subscribers):
+            subscriber.close()
+        self._subscribers.clear()
+
+    async def notify(self, db: AsyncSession, op: str, changes: Sequence[dict]):
+        """
+            Notify dog changes in the transaction of the write, before its commit.
+
+            The notifications are delivered when the transaction commits and
+            dropped if it rolls back. A failure to send them fails the write.
+
+            Args:
+            - db (AsyncSession): Database session of the write.
+            - op (str): created, updated or deleted.
+            - changes: One dict per dog, with at least its `id`.
+        """
+        if not changes:
+            return
+        payloads = [json.dumps({"op": op, **change}, default=str) for change in changes]
+        if not self.postgresql:
+            db.sync_session.info.setdefault(CHANGES_PENDING_KEY, []).extend((op, payload) for payload in payloads)
+            return
+        await db.execute(text("SELECT pg_notify(:channel, :payload)"),
+                         [{"channel": CHANGES_CHANNEL, "payload": payload} for payload in payloads])
+
+    def subscribe(self, last_event_id: Optional[str] = None) -> Subscriber:
+        """
+            Register a subscriber, queueing the events after `last_event_id` first.
+
+            When those events are no longer buffered, or come from another
+            process or run, a reset event is queued instead.
+
+            Args:
+            - last_event_id (str): ID of the last event the client received.
+
+            Returns:
+            - The subscriber, to read its queue and to unsubscribe it.
+        """
+        subscriber = Subscriber(self.queue_size)
+        if last_event_id:
+            missed = self._missed(last_event_id)
+            if missed is None:
+                subscriber.put((self._event_id(self._sequence), RESET, "{}"))
+            else:
+                for sequence, op, payload in missed[:self.queue_size - 1]:
+                    subscriber.put((self._event_id(sequence), op, payload))
+                if len(missed) >= self.queue_size:
+                    # The rest is replayed when the client reconnects
+                    subscriber.put(None)
+                    return subscriber
+        self._subscribers.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber):
+        self._subscribers.discard(subscriber)
+
+    async def stream(self, last_event_id: Optional[str] = None,
+                     heartbeat: float = CHANGES_HEARTBEAT_SECONDS) -> AsyncIterator[str]:
+        """
+            Stream the changes as Server-Sent Events, until the feed ends the stream.
+
+            Args:
+            - last_event_id (str): ID of the last event the client received.
+            - heartbeat (float): Seconds between keep-alive comments when idle.
+
+            Returns:
+            - Async iterator of SSE messages, the event type is the operation.
+        """
+        subscriber = self.subscribe(last_event_id)
+        try:
+            # Reconnection delay for EventSource clients, in milliseconds
+            yield "retry: 3000\n\n"
+            while True:
+                try:
+                    event = await asyncio.wait_for(subscriber.queue.get(), heartbeat)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                if event is None:
+                    return
+                event_id, op, payload = event
+                yield f"id: {event_id}\nevent: {op}\ndata: {payload}\n\n"
+        finally:
+            self.unsubscribe(subscriber)
+
+    def stats(self) -> dict:
+        return {"subscribers": len(self._subscribers), "sequence": self._sequence, "dropped": self.dropped}
+
+    def _event_id(self, sequence: int) -> str:
+        return f"{self.epoch}-{sequence}"
+
+    def _missed(self, last_event_id: str) -> Optional[List[Tuple[int, str, str]]]:
+        epoch, _, sequence = last_event_id.partition("-")
+        if epoch != self.epoch or not sequence.isdigit():
+            return None
+        sequence = int(sequence)
+        oldest = self._buffer[0][0] if self._buffer else self._sequence + 1
+        if sequence > self._sequence or sequence < oldest - 1:
+            return None
+        return [event for event in self._buffer if event[0] > sequence]
+
+    def _dispatch(self, op: str, payload: str):
+        self._sequence += 1
+        self._buffer.append((self._sequence, op, payload))
+        event = (self._event_id(self._sequence), op, payload)
+        for subscriber in list(self._subscribers):
+            if not subscriber.put(event):
+                # Too slow, it reconnects and resumes from its last event
+                self.dropped += 1
+                self._subscribers.discard(subscriber)
+                subscriber.close()
+
+    def _after_commit(self, session: Session):
+        for op, payload in session.info.pop(CHANGES_PENDING_KEY, ()):
+            self._dispatch(op, payload)
+
+    def _after_rollback(self, session: Session, previous_transaction):
+        if not previous_transaction.nested:
+            session.info.pop(CHANGES_PENDING_KEY, None)
+
+    def _on_notification(self, connection, pid, channel, payload: str):
+        try:
+            op = json.loads(payload)["op"]
+        except (ValueError, KeyError) as e:
+            logger.warning(f"Invalid dog change notification {payload!r}: {e}")
+            return
+        self._dispatch(op, payload)
+
+    def _reset(self):
+        """
+            Tell every subscriber that events may have been missed.
+        """
+        self._sequence += 1
+        self._buffer.clear()
+        event = (self._event_id(self._sequence), RESET, "{}")
+        for subscriber in list(self._subscribers):
+            subscriber.put(event)
+
+    async def _listen(self):
+        # asyncpg is only required on PostgreSQL
+        import asyncpg
+        dsn = async_engine.url.set(drivername="postgresql").render_as_string(hide_password=False)
+        delay = CHANGES_RECONNECT_SECONDS
+        connected = False
+        while True:
+            connection = None
+            try:
+                connection = await asyncpg.connect(dsn)
+                await connection.add_listener(CHANGES_CHANNEL, self._on_notification)
+                if connected:
+                    # Notifications sent while reconnecting are lost
+                    self._reset()
+                connected = True
+                delay = CHANGES_RECONNECT_SECONDS
+                closed = asyncio.Event()
+                connection.add_termination_listener(lambda _: closed.set())
+                await closed.wait()
+                logger.warning("Dog changes listener connection closed, reconnecting")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Dog changes listener error, retrying in {delay}s: {e}")
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, 30)
+            finally:
+                if connection is not None and not connection.is_closed():
+                    await connection.close()
+
+
+change_feed = ChangeFeed()
+# Changes kept on the session (databases without pg_notify) are dispatched
+# once it commits, and dropped when it rolls back
+event.listen(Session, "after_commit", change_feed._after_commit)
+event.listen(Session, "after_soft_rollback", change_feed._after_rollback)
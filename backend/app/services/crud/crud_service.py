@@ -1,7 +1,31 @@
+import os
+import json
 # FastAPI imports
 from fastapi import status, HTTPException
 # SQLAlchemy imports
-from sqlalchemy.orm import Session
+from sqlalchemy import select, insert, update, delete, bindparam
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import aliased
+# Typing imports
+from typing import Iterator, List, Optional, Sequence, Set
+# dotenv imports
+from dotenv import load_dotenv
+# Local imports
+from app.db.database import async_engine
+from app.utils.pagination import decode_cursor
+from app.services.cache import cache
+
+load_dotenv()
+# Number of registers sent to the database per statement in bulk operations
+BULK_BATCH_SIZE = int(os.getenv("BULK_BATCH_SIZE", "500"))
+
+
+def _batches(items: Sequence, size: int) -> Iterator[Sequence]:
+    """
+        Split a sequence in consecutive chunks of at most `size` items.
+    """
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
 
 
 class BASECrud:
@@ -9,16 +33,82 @@ class BASECrud:
         Base CRUD class with default methods.
     """
 
-    def __init__(self, model):
+    # Columns whose value before an update is needed to invalidate the cache
+    stale_columns: List[str] = []
+
+    def __init__(self, model, schema=None):
         self.model = model
+        # Response schema of the cached reads
+        self.schema = schema
+
+    def _cache_key(self, obj_id) -> str:
+        """
+            Cache key of a register by ID.
+        """
+        return f"{self.model.__tablename__}:id:{obj_id}"
 
-    def _create(self, db: Session, obj_in):
+    def _cache_keys(self, db_obj) -> List[str]:
+        """
+            Cache keys to invalidate when the given register changes.
+            Subclasses add the keys of related registers.
+        """
+        return [self._cache_key(db_obj.id)]
+
+    @staticmethod
+    def _cacheable(db: AsyncSession) -> bool:
+        """
+            Whether the registers read with a session may be cached. Only the
+            primary ones are, a replica may still return the state before a
+            write and caching it would undo the invalidation of that write
+            until the entry expires.
+        """
+        return db.bind is async_engine
+
+    async def _cache_store(self, db: AsyncSession, db_obj) -> dict:
+        """
+            Store a register in the cache as its JSON response data, when it
+            was read from the primary.
+
+            Returns:
+            - dict: The cached data.
+        """
+        data = json.loads(self.schema.from_orm(db_obj).json())
+        if self._cacheable(db):
+            await cache.set(self._cache_key(db_obj.id), data)
+        return data
+
+    async def _invalidate(self, *db_objs):
+        """
+            Remove the given registers and their related keys from the cache.
+        """
+        keys = []
+        for db_obj in db_objs:
+            keys.extend(self._cache_keys(db_obj))
+        await cache.delete(*keys)
+
+    async def _created(self, db: AsyncSession, db_objs: Sequence):
+        """
+            Hook called with the new registers of each INSERT, flushed but not
+            committed, so subclasses can write related rows in the same
+            transaction, in bulk.
+        """
+
+    async def _changed(self, db: AsyncSession, op: str, db_objs: Sequence, bulk: bool = False):
+        """
+            Hook called with the registers created, updated or deleted by a
+            write, before its commit, so subclasses can notify the change in
+            the same transaction. With `bulk` the registers may only hold part
+            of their columns, e.g. the new values of an update.
+        """
+
+    async def _create(self, db: AsyncSession, obj_in, **fields):
         """
             Create a new database register.
 
             Args:
-            - db (Session): Database session.
+            - db (AsyncSession): Database session.
             - obj_in: Input data for creating a new record.
+            - fields: Extra column values not part of the input schema.
 
             Returns:
             - The newly created database record.
@@ -27,22 +117,27 @@ class BASECrud:
             - Exception: Any unexpected error during the database operation.
         """
         try:
-            db_obj = self.model(**obj_in.dict())
+            db_obj = self.model(**obj_in.dict(), **fields)
             db.add(db_obj)
-            db.commit()
-            db.refresh(db_obj)
+            await db.flush()
+            await db.refresh(db_obj)
+            await self._created(db, [db_obj])
+            await self._changed(db, "created", [db_obj])
+            await db.commit()
+            await self._invalidate(db_obj)
             return db_obj
         except Exception as e:
             raise HTTPException(
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
 
-    def _read(self, db: Session, obj_id):
+    async def _read(self, db: AsyncSession, obj_id, options: Sequence = ()):
         """
             Retrieve a database register by ID.
 
             Args:
-            - db (Session): Database session.
+            - db (AsyncSession): Database session.
             - obj_id: ID of the record to retrieve.
+            - options: Loader options for the query, e.g. relationship loading.
 
             Returns:
             - The retrieved database register or None if not found.
@@ -51,79 +146,385 @@ class BASECrud:
             - Exception: Any unexpected error during the database operation.
         """
         try:
-            return db.query(self.model).filter(self.model.id == obj_id).first()
+            result = await db.execute(
+                select(self.model).filter(self.model.id == obj_id).options(*options))
+            return result.unique().scalars().first()
         except Exception as e:
             raise HTTPException(
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
 
-    def _update(self, db: Session, obj_id, obj_in):
+    async def _read_cached(self, db: AsyncSession, obj_id):
+        """
+            Retrieve a register by ID through the read-through cache.
+
+            Args:
+            - db (AsyncSession): Database session.
+            - obj_id: ID of the record to retrieve.
+
+            Returns:
+            - The register as its response schema or None if not found.
+        """
+        data = await cache.get(self._cache_key(obj_id))
+        if data is None:
+            db_obj = await self._read(db, obj_id)
+            if db_obj is None:
+                return None
+            data = await self._cache_store(db, db_obj)
+        return self.schema.parse_obj(data)
+
+    async def _update(self, db: AsyncSession, obj_id, obj_in):
         """
             Update a database register by ID.
 
             Args:
-            - db (Session): Database session.
+            - db (AsyncSession): Database session.
             - obj_id: ID of the register to update.
             - obj_in: Input data for updating the register.
 
             Returns:
-            - The updated database register.
+            - The updated database register or None if not found.
+
+            Raises:
+            - Exception: Any unexpected error during the database operation.
+        """
+        return await self._update_where(db, self.model.id == obj_id, obj_in.dict())
+
+    async def _delete(self, db: AsyncSession, obj_id):
+        """
+            Delete a database register by ID.
+
+            Args:
+            - db (AsyncSession): Database session.
+            - obj_id: ID or name (or any unique identifier) of the register to delete.
+
+            Returns:
+            - The deleted database register or None if not found.
+
+            Raises:
+            - Exception: Any unexpected error during the database operation.
+        """
+        return await self._delete_where(db, self.model.id == obj_id)
+
+    async def _update_where(self, db: AsyncSession, criteria, values: dict):
+        """
+            Update the register matching `criteria` and return it.
+
+            With RETURNING support this is a single UPDATE ... RETURNING
+            statement, which also returns the previous value of the
+            `stale_columns` (on PostgreSQL a subquery in RETURNING still sees
+            the row before the update) to invalidate their cache keys.
+            Otherwise the register is read and then updated.
+
+            Args:
+            - db (AsyncSession): Database session.
+            - criteria: SQL expression matching at most one register.
+            - values (dict): Column values to set.
+
+            Returns:
+            - The updated database register or None if not found.
 
             Raises:
             - Exception: Any unexpected error during the database operation.
         """
         try:
-            db_obj = db.query(self.model).filter(
-                self.model.id == obj_id).first()
-            for field, value in obj_in.dict().items():
-                setattr(db_obj, field, value)
-            db.commit()
-            db.refresh(db_obj)
+            if self._supports_returning(db):
+                previous = aliased(self.model)
+                old_columns = [
+                    select(getattr(previous, column)).filter(previous.id == self.model.id)
+                    .scalar_subquery().label(f"old_{column}")
+                    for column in self.stale_columns
+                ]
+                query = update(self.model).filter(criteria).values(**values).returning(
+                    *self.model.__table__.c, *old_columns)
+                result = await db.execute(
+                    select(self.model, *old_columns).from_statement(query),
+                    execution_options={"populate_existing": True})
+                row = result.first()
+                if row is None:
+                    await db.commit()
+                    return None
+                db_obj = row[0]
+                old_obj = self.model(id=db_obj.id, **{column: row[f"old_{column}"] for column in self.stale_columns})
+                stale_keys = self._cache_keys(old_obj)
+            else:
+                result = await db.execute(select(self.model).filter(criteria))
+                db_obj = result.scalars().first()
+                if db_obj is None:
+                    return None
+                stale_keys = self._cache_keys(db_obj)
+                for field, value in values.items():
+                    setattr(db_obj, field, value)
+            await self._changed(db, "updated", [db_obj])
+            await db.commit()
+            await cache.delete(*stale_keys, *self._cache_keys(db_obj))
             return db_obj
         except Exception as e:
+            await db.rollback()
             raise HTTPException(
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
 
-    def _delete(self, db: Session, obj_id):
+    async def _delete_where(self, db: AsyncSession, criteria):
         """
-            Delete a database register by ID.
+            Delete the register matching `criteria`.
+
+            With RETURNING support this is a single DELETE ... RETURNING
+            statement, otherwise the register is read and then deleted.
 
             Args:
-            - db (Session): Database session.
-            - obj_id: ID or name (or any unique identifier) of the register to delete.
+            - db (AsyncSession): Database session.
+            - criteria: SQL expression matching at most one register.
 
             Returns:
-            - The deleted database register.
+            - The deleted database register or None if not found.
 
             Raises:
             - Exception: Any unexpected error during the database operation.
         """
         try:
-            db_obj = db.query(self.model).filter(
-                self.model.id == obj_id).first()
-            db.delete(db_obj)
-            db.commit()
+            if self._supports_returning(db):
+                query = delete(self.model).filter(criteria).returning(*self.model.__table__.c)
+                result = await db.execute(
+                    select(self.model).from_statement(query),
+                    execution_options={"populate_existing": True})
+                db_obj = result.scalars().first()
+            else:
+                result = await db.execute(select(self.model).filter(criteria))
+                db_obj = result.scalars().first()
+                if db_obj is not None:
+                    await db.delete(db_obj)
+            if db_obj is not None:
+                await self._changed(db, "deleted", [db_obj])
+            await db.commit()
+            if db_obj is not None:
+                await self._invalidate(db_obj)
             return db_obj
         except Exception as e:
+            await db.rollback()
             raise HTTPException(
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
 
-    def _read_all(self, db: Session, skip: int = 0, limit: int = 10):
+    def _paginate(self, query, skip: int = 0, limit: int = 10, cursor: Optional[str] = None):
+        """
+            Apply the ID ordering and the cursor or skip/limit pagination to a query.
+        """
+        query = query.order_by(self.model.id).limit(limit)
+        if cursor:
+            return query.filter(self.model.id > decode_cursor(cursor))
+        return query.offset(skip)
+
+    async def _read_all(self, db: AsyncSession, skip: int = 0, limit: int = 10, cursor: Optional[str] = None,
+                        options: Sequence = ()):
         """
             Retrieve a list of database register with optional pagination.
 
+            When a cursor is given the page is read with keyset pagination
+            (id > last id), which costs the same whatever the page depth.
+            Otherwise skip/limit offset pagination is used.
+
             Args:
-            - db (Session): Database session.
+            - db (AsyncSession): Database session.
             - skip (int): Number of register to skip (for pagination).
             - limit (int): Maximum number of register to retrieve (for pagination).
+            - cursor (str): Opaque cursor returned by the previous page.
+            - options: Loader options for the query, e.g. relationship loading.
 
             Returns:
-            - List of retrieved database register.
+            - List of retrieved database register ordered by ID.
 
             Raises:
             - Exception: Any unexpected error during the database operation.
         """
+        query = self._paginate(select(self.model).options(*options), skip, limit, cursor)
+        try:
+            result = await db.execute(query)
+            return result.unique().scalars().all()
+        except Exception as e:
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
+
+    def _columns(self, fields: Optional[Sequence[str]] = None) -> List:
+        """
+            Table columns of the given fields, every field of the response schema by default.
+        """
+        table = self.model.__table__
+        names = self.schema.__fields__ if fields is None else fields
+        return [table.c[name] for name in names if name in table.c]
+
+    async def _read_all_rows(self, db: AsyncSession, skip: int = 0, limit: int = 10,
+                             cursor: Optional[str] = None, fields: Optional[Sequence[str]] = None) -> List[dict]:
+        """
+            Retrieve a page of registers as plain dicts, without building ORM
+            objects, for the fast serialization path and the sparse
+            fieldsets. Only the columns of `fields` are selected. Pagination
+            as in `_read_all`.
+
+            Args:
+            - db (AsyncSession): Database session.
+            - skip (int): Number of register to skip (for pagination).
+            - limit (int): Maximum number of register to retrieve (for pagination).
+            - cursor (str): Opaque cursor returned by the previous page.
+            - fields: Fields to select, every field of the response schema by default.
+
+            Returns:
+            - List of dicts ordered by ID.
+
+            Raises:
+            - Exception: Any unexpected error during the database operation.
+        """
+        query = self._paginate(select(*self._columns(fields)), skip, limit, cursor)
+        try:
+            result = await db.execute(query)
+            return [dict(row) for row in result.mappings()]
+        except Exception as e:
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
+
+    def _supports_returning(self, db: AsyncSession) -> bool:
+        """
+            Check if the database behind the session supports RETURNING
+            on INSERT, UPDATE and DELETE statements.
+        """
+        return db.bind.dialect.full_returning
+
+    async def _bulk_create(self, db: AsyncSession, objs_in: Sequence, batch_size: int = BULK_BATCH_SIZE,
+                           fields: Optional[Sequence[dict]] = None) -> List:
+        """
+            Create many database registers in a single transaction.
+
+            Each batch is written with one multi-row INSERT ... RETURNING when
+            the database supports it, otherwise the batch is flushed through
+            the session.
+
+            Args:
+            - db (AsyncSession): Database session.
+            - objs_in: Input data for the new registers.
+            - batch_size (int): Number of registers per INSERT statement.
+            - fields: Extra column values of each register not part of the input schema.
+
+            Returns:
+            - List of created database registers, in input order.
+
+            Raises:
+            - Exception: Any unexpected error during the database operation,
+              in which case nothing is created.
+        """
+        try:
+            db_objs = []
+            rows = [obj_in.dict() for obj_in in objs_in]
+            for row, extra in zip(rows, fields or ()):
+                row.update(extra)
+            for batch in _batches(rows, batch_size):
+                if self._supports_returning(db):
+                    query = insert(self.model).values(list(batch)).returning(*self.model.__table__.c)
+                    result = await db.execute(select(self.model).from_statement(query))
+                    batch_objs = result.scalars().all()
+                else:
+                    batch_objs = [self.model(**row) for row in batch]
+                    db.add_all(batch_objs)
+                    await db.flush()
+                await self._created(db, batch_objs)
+                await self._changed(db, "created", batch_objs, bulk=True)
+                db_objs.extend(batch_objs)
+            await db.commit()
+            await self._invalidate(*db_objs)
+            return db_objs
+        except Exception as e:
+            await db.rollback()
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
+
+    async def _bulk_update(self, db: AsyncSession, objs_in: Sequence, batch_size: int = BULK_BATCH_SIZE) -> Set[int]:
+        """
+            Update many database registers by ID in a single transaction.
+
+            Each batch checks which IDs exist with one SELECT and updates them
+            with one executemany UPDATE.
+
+            Args:
+            - db (AsyncSession): Database session.
+            - objs_in: Input data for the registers, each one with its `id`.
+            - batch_size (int): Number of registers per statement.
+
+            Returns:
+            - Set of the IDs that were found and updated.
+
+            Raises:
+            - Exception: Any unexpected error during the database operation,
+              in which case nothing is updated.
+        """
+        if not objs_in:
+            return set()
+        try:
+            table = self.model.__table__
+            fields = [field for field in objs_in[0].dict() if field != "id"]
+            query = update(table).where(table.c.id == bindparam("_id")).values(
+                {field: bindparam(f"_{field}") for field in fields})
+            updated_ids = set()
+            updated_objs = []
+            stale_keys = []
+            for batch in _batches(objs_in, batch_size):
+                result = await db.execute(
+                    select(self.model).filter(self.model.id.in_([obj_in.id for obj_in in batch])))
+                existing_objs = result.scalars().all()
+                existing_ids = {db_obj.id for db_obj in existing_objs}
+                for db_obj in existing_objs:
+                    stale_keys.extend(self._cache_keys(db_obj))
+                params = []
+                for obj_in in batch:
+                    if obj_in.id in existing_ids:
+                        values = obj_in.dict(exclude={"id"})
+                        params.append({"_id": obj_in.id, **{f"_{field}": value for field, value in values.items()}})
+                        updated_obj = self.model(id=obj_in.id, **values)
+                        updated_objs.append(updated_obj)
+                        stale_keys.extend(self._cache_keys(updated_obj))
+                if params:
+                    await db.execute(query, params)
+                updated_ids |= existing_ids
+            if updated_objs:
+                await self._changed(db, "updated", updated_objs, bulk=True)
+            await db.commit()
+            await cache.delete(*stale_keys)
+            return updated_ids
+        except Exception as e:
+            await db.rollback()
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
+
+    async def _bulk_delete(self, db: AsyncSession, obj_ids: Sequence[int], batch_size: int = BULK_BATCH_SIZE) -> Set[int]:
+        """
+            Delete many database registers by ID in a single transaction.
+
+            Args:
+            - db (AsyncSession): Database session.
+            - obj_ids: IDs of the registers to delete.
+            - batch_size (int): Number of IDs per DELETE statement.
+
+            Returns:
+            - Set of the IDs that were found and deleted.
+
+            Raises:
+            - Exception: Any unexpected error during the database operation,
+              in which case nothing is deleted.
+        """
         try:
-            return db.query(self.model).offset(skip).limit(limit).all()
+            deleted_rows = []
+            for batch in _batches(list(obj_ids), batch_size):
+                query = delete(self.model).filter(self.model.id.in_(batch))
+                if self._supports_returning(db):
+                    result = await db.execute(
+                        query.returning(*self.model.__table__.c), execution_options={"synchronize_session": False})
+                    deleted_rows.extend(result.all())
+                else:
+                    result = await db.execute(
+                        select(*self.model.__table__.c).filter(self.model.id.in_(batch)))
+                    deleted_rows.extend(result.all())
+                    await db.execute(query, execution_options={"synchronize_session": False})
+            if deleted_rows:
+                await self._changed(db, "deleted", deleted_rows, bulk=True)
+            await db.commit()
+            await self._invalidate(*deleted_rows)
+            return {row.id for row in deleted_rows}
         except Exception as e:
+            await db.rollback()
             raise HTTPException(
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
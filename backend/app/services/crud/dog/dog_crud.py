@@ -1,10 +1,21 @@
 # FastAPI imports
-from fastapi import HTTPException, status
+from fastapi.encoders import jsonable_encoder
 # SQLAlchemy model imports
-from sqlalchemy.orm import Session
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+# Typing imports
+from typing import AsyncIterator, List, Sequence
 # Local imports
 from app.models.dog import Dog
+from app.schemas.dog import DogResponse
+from app.services.cache import cache
+from app.services.changes import change_feed
 from app.services.crud.crud_service import BASECrud
+from app.services.outbox import add_events
+from app.utils.database import logger
+
+# Celery task published for every created dog
+DOG_CREATED_TASK = "app.core.tasks.delay_task"
 
 
 class DogCrud(BASECrud):
@@ -12,83 +23,176 @@ class DogCrud(BASECrud):
         CRUD for Dog. this class inherits from the superclass BASECrud.
     """
 
-    def __init__(self, model=Dog):
-        super().__init__(model)
+    def __init__(self, model=Dog, schema=DogResponse):
+        super().__init__(model, schema)
+        self.stale_columns = ["user_id"]
+
+    def _cache_keys(self, db_obj) -> List[str]:
+        """
+            Cache keys to invalidate when a dog changes, the dog and its owner.
+        """
+        keys = super()._cache_keys(db_obj)
+        if db_obj.user_id is not None:
+            keys.append(f"user:id:{db_obj.user_id}")
+        return keys
+
+    async def _created(self, db: AsyncSession, db_objs: Sequence):
+        """
+            Add a created task per dog to the outbox, committed with the dogs.
+            Its ID is kept on the dog as `task_id` for the client to follow it.
+        """
+        task_ids = await add_events(db, DOG_CREATED_TASK, [{"dog_id": db_obj.id} for db_obj in db_objs])
+        for db_obj, task_id in zip(db_objs, task_ids):
+            db_obj.task_id = task_id
+            logger.info(f"Task ID: {task_id}")
+
+    async def _changed(self, db: AsyncSession, op: str, db_objs: Sequence, bulk: bool = False):
+        """
+            Notify the change feed of the dogs in the transaction of the
+            write. Single writes send the state of the dog, bulk writes only
+            its ID.
+        """
+        if bulk:
+            changes = [{"id": db_obj.id} for db_obj in db_objs]
+        else:
+            changes = [{"id": db_obj.id, "dog": jsonable_encoder(self.schema.from_orm(db_obj))} for db_obj in db_objs]
+        await change_feed.notify(db, op, changes)
 
-    def _read_by_name(self, db: Session, name: str):
+    async def _read_by_name(self, db: AsyncSession, name: str):
         """
-            Retrieve a database register by name.
+            Retrieve a database register by name, case-insensitive.
 
             Args:
-            - db (Session): Database session.
+            - db (AsyncSession): Database session.
             - name (str): Name of the register to retrieve.
 
             Returns:
             - The retrieved database register or None if not found.
         """
-        return db.query(self.model).filter(self.model.name.ilike(name)).first()
+        result = await db.execute(
+            select(self.model).filter(func.lower(self.model.name) == name.lower()))
+        return result.scalars().first()
+
+    async def _read_by_name_cached(self, db: AsyncSession, name: str):
+        """
+            Retrieve a register by name through the read-through cache.
 
-    def _read_all_adopted(self, db: Session, is_adopted: bool):
+            The name key only stores the dog ID, the data is read from the ID
+            key, so invalidating a dog by ID is enough. An entry whose name no
+            longer matches (the dog was renamed) is treated as a miss.
+
+            Args:
+            - db (AsyncSession): Database session.
+            - name (str): Name of the register to retrieve.
+
+            Returns:
+            - The register as DogResponse or None if not found.
+        """
+        name_key = f"{self.model.__tablename__}:name:{name.lower()}"
+        obj_id = await cache.get(name_key)
+        if obj_id is not None:
+            data = await cache.get(self._cache_key(obj_id))
+            if data is not None and data["name"].lower() == name.lower():
+                return self.schema.parse_obj(data)
+        db_obj = await self._read_by_name(db, name)
+        if db_obj is None:
+            return None
+        data = await self._cache_store(db, db_obj)
+        if self._cacheable(db):
+            await cache.set(name_key, db_obj.id)
+        return self.schema.parse_obj(data)
+
+    async def _read_all_adopted(self, db: AsyncSession, is_adopted: bool):
         """
             Retrieve a list of database register that are marked as adopted.
 
             Args:
-            - db (Session): Database session.
+            - db (AsyncSession): Database session.
 
             Returns:
             - List of retrieved database register marked as adopted.
         """
-        return db.query(self.model).filter(self.model.is_adopted == is_adopted).all()
+        result = await db.execute(
+            select(self.model).filter(self.model.is_adopted == is_adopted))
+        return result.scalars().all()
+
+    async def _read_all_adopted_rows(self, db: AsyncSession, is_adopted: bool) -> List[dict]:
+        """
+            Retrieve the registers filtered by adopted status as plain dicts,
+            for the fast serialization path.
+
+            Args:
+            - db (AsyncSession): Database session.
+            - is_adopted (bool): Adopted status to filter by.
+
+            Returns:
+            - List of dicts of the response schema columns.
+        """
+        result = await db.execute(
+            select(*self._columns()).filter(self.model.is_adopted == is_adopted))
+        return [dict(row) for row in result.mappings()]
+
+    async def _stream_all_adopted(self, db: AsyncSession, is_adopted: bool, chunk_size: int) -> AsyncIterator[List]:
+        """
+            Stream the registers filtered by adopted status in chunks.
+
+            Rows are read through a server-side cursor, `chunk_size` at a
+            time, so memory stays bounded whatever the result size.
+
+            Args:
+            - db (AsyncSession): Database session.
+            - is_adopted (bool): Adopted status to filter by.
+            - chunk_size (int): Number of registers fetched per chunk.
+
+            Returns:
+            - Async iterator of lists of database registers ordered by ID.
+        """
+        query = select(self.model).filter(self.model.is_adopted == is_adopted).order_by(
+            self.model.id).execution_options(yield_per=chunk_size)
+        result = await db.stream(query)
+        async for chunk in result.scalars().partitions(chunk_size):
+            yield chunk
+
+    def _first_by_name(self, name: str):
+        """
+            Criteria matching the first register (lowest ID) with the given name, case-insensitive.
+        """
+        first_id = select(self.model.id).filter(func.lower(self.model.name) == name.lower()) \
+            .order_by(self.model.id).limit(1).scalar_subquery()
+        return self.model.id == first_id
 
-    def _update_by_name(self, db: Session, name: str, obj_in):
+    async def _update_by_name(self, db: AsyncSession, name: str, obj_in):
         """
-            Update the name of a database register by ID.
+            Update a database register by name in a single statement.
 
             Args:
-            - db (Session): Database session.
-            - obj_id: ID of the record to update.
-            - name (str): New name for the record.
+            - db (AsyncSession): Database session.
+            - name (str): Name of the record to update.
+            - obj_in: Input data for updating the record.
 
             Returns:
-            - The updated database record.
+            - The updated database record or None if not found.
 
             Raises:
             - Exception: Any unexpected error during the database operation.
         """
-        try:
-            db_obj = db.query(self.model).filter(self.model.name.ilike(name)).first()
-            for field, value in obj_in.dict().items():
-                setattr(db_obj, field, value)
-            db.commit()
-            db.refresh(db_obj)
-            return db_obj
-        except Exception as e:
-            raise HTTPException(
-                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
+        return await self._update_where(db, self._first_by_name(name), obj_in.dict())
 
-    def _delete_by_name(self, db: Session, name: str):
+    async def _delete_by_name(self, db: AsyncSession, name: str):
         """
-            Delete a database record by name.
+            Delete a database record by name in a single statement.
 
             Args:
-            - db (Session): Database session.
+            - db (AsyncSession): Database session.
             - name (str): Name of the record to delete.
 
             Returns:
-            - The deleted database record.
+            - The deleted database record or None if not found.
 
             Raises:
             - Exception: Any unexpected error during the database operation.
         """
-        try:
-            db_obj = db.query(self.model).filter(
-                self.model.name == name).first()
-            db.delete(db_obj)
-            db.commit()
-            return db_obj
-        except Exception as e:
-            raise HTTPException(
-                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
+        return await self._delete_where(db, self._first_by_name(name))
 
 
 dog_crud = DogCrud()
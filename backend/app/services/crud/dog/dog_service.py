@@ -1,89 +1,166 @@
+import os
 # FastAPI imports
 from fastapi import status, HTTPException
 # SQLAlchemy imports
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession
+# Typing imports
+from typing import AsyncIterator, List, Optional, Sequence
+# dotenv imports
+from dotenv import load_dotenv
 # Local imports
-from app.utils.database import logger
-from app.core.celery import celery
+from app.db.database import AsyncSessionLocal, async_engine
+from app.schemas.dog import DogBulkResult, DogResponse
+from app.services.crud.crud_service import BULK_BATCH_SIZE
+from app.services.outbox import outbox_relay
+from app.services.picture import picture_enricher, picture_provider
 from .dog_crud import dog_crud
 
+load_dotenv()
+# Number of registers read and written per chunk when streaming
+STREAM_CHUNK_SIZE = int(os.getenv("STREAM_CHUNK_SIZE", "500"))
+
 
 class DogService():
 
-    def read_all(self, db: Session, skip: int, limit: int):
+    async def read_all(self, db: AsyncSession, skip: int, limit: int, cursor: Optional[str] = None):
         """
             Retrieve a list of database registers with optional pagination.
 
             Args:
-            - db (Session): Database session.
+            - db (AsyncSession): Database session.
             - skip (int): Number of registers to skip (for pagination).
             - limit (int): Maximum number of registers to retrieve (for pagination).
+            - cursor (str): Cursor of the page to retrieve, replaces skip when given.
 
             Returns:
             - List of retrieved database registers.
         """
-        db_objs = dog_crud._read_all(db, skip, limit)
+        db_objs = await dog_crud._read_all(db, skip, limit, cursor)
         if not db_objs:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND, detail="No dogs found")
         return db_objs
 
-    def read_by_id(self, db: Session, obj_id):
+    async def read_all_rows(self, db: AsyncSession, skip: int, limit: int, cursor: Optional[str] = None,
+                            fields: Optional[Sequence[str]] = None) -> List[dict]:
+        """
+            Retrieve a page of database registers as plain dicts, for the fast serialization path and the sparse fieldsets.
+
+            Args:
+            - db (AsyncSession): Database session.
+            - skip (int): Number of registers to skip (for pagination).
+            - limit (int): Maximum number of registers to retrieve (for pagination).
+            - cursor (str): Cursor of the page to retrieve, replaces skip when given.
+            - fields: DogResponse fields to return, all by default.
+
+            Returns:
+            - List of dicts of the DogResponse fields.
+        """
+        rows = await dog_crud._read_all_rows(db, skip, limit, cursor, fields)
+        if not rows:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND, detail="No dogs found")
+        return rows
+
+    async def read_by_id(self, db: AsyncSession, obj_id):
         """
             Retrieve a database register by ID.
 
             Args:
-            - db (Session): Database session.
+            - db (AsyncSession): Database session.
             - obj_id: ID of the register to retrieve.
 
             Returns:
             - The retrieved database register or None if not found.
         """
-        db_obj = dog_crud._read(db, obj_id)
+        db_obj = await dog_crud._read_cached(db, obj_id)
         if not db_obj:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND, detail="Dog not found")
         return db_obj
 
-    def read_by_name(self, db: Session, obj_name: str):
+    async def read_by_name(self, db: AsyncSession, obj_name: str):
         """
             Retrieve a database register by name.
 
             Args:
-            - db (Session): Database session.
+            - db (AsyncSession): Database session.
             - obj_id: Name of the register to retrieve.
 
             Returns:
             - The retrieved database register or None if not found.
         """
-        db_obj = dog_crud._read_by_name(db, obj_name)
+        db_obj = await dog_crud._read_by_name_cached(db, obj_name)
         if not db_obj:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND, detail="Dog not found")
         return db_obj
 
-    def read_all_adopted(self, db: Session, is_adopted: bool):
+    async def read_all_adopted(self, db: AsyncSession, is_adopted: bool):
         """
             Retrieve a list of adopted database register.
 
             Args:
-            - db (Session): Database session.
+            - db (AsyncSession): Database session.
 
             Returns:
             - List of retrieved database register marked as adopted.
         """
-        db_objs = dog_crud._read_all_adopted(db, is_adopted)
+        db_objs = await dog_crud._read_all_adopted(db, is_adopted)
         if not db_objs:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND, detail="No dogs found")
         return db_objs
 
-    def create(self, db: Session, obj_in):
+    async def read_all_adopted_rows(self, db: AsyncSession, is_adopted: bool) -> List[dict]:
+        """
+            Retrieve the registers filtered by adopted status as plain dicts, for the fast serialization path.
+
+            Args:
+            - db (AsyncSession): Database session.
+            - is_adopted (bool): Adopted status to filter by.
+
+            Returns:
+            - List of dicts of the DogResponse fields.
+        """
+        rows = await dog_crud._read_all_adopted_rows(db, is_adopted)
+        if not rows:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND, detail="No dogs found")
+        return rows
+
+    async def stream_all_adopted(self, is_adopted: bool, chunk_size: int = STREAM_CHUNK_SIZE,
+                                 bind: Optional[AsyncEngine] = None) -> AsyncIterator[str]:
+        """
+            Stream the registers filtered by adopted status as NDJSON.
+
+            Uses its own session because the stream is consumed after the
+            endpoint returns.
+
+            Args:
+            - is_adopted (bool): Adopted status to filter by.
+            - chunk_size (int): Number of registers read and written at a time.
+            - bind (AsyncEngine): Engine to read from, e.g. a replica, the primary by default.
+
+            Returns:
+            - Async iterator of NDJSON text, one DogResponse per line.
+        """
+        async with AsyncSessionLocal(bind=bind or async_engine) as db:
+            async for chunk in dog_crud._stream_all_adopted(db, is_adopted, chunk_size):
+                yield "".join(DogResponse.from_orm(db_obj).json() + "\n" for db_obj in chunk)
+
+    async def create(self, db: AsyncSession, obj_in):
         """
             Create a new database record.
 
+            The picture is taken from the prefetched reservoir. When it is empty
+            the register is created with `picture_pending` set and its picture
+            is filled in the background by the picture enricher. Its created
+            task is written to the outbox with the register and published by
+            the outbox relay, so the broker is not waited for.
+
             Args:
-            - db (Session): Database session.
+            - db (AsyncSession): Database session.
             - obj_in: Input data for creating a new register.
 
             Returns:
@@ -93,21 +170,89 @@ class DogService():
             - Exception: Any unexpected error during the database operation.
         """
         try:
-            db_obj = dog_crud._create(db, obj_in)
-            db_obj.name = db_obj.name.lower()
-            result = celery.send_task("app.core.tasks.delay_task")
-            logger.info(f"Task ID: {result.id}")
+            obj_in = obj_in.copy(update={"name": obj_in.name.lower()})
+            picture = picture_provider.take()
+            db_obj = await dog_crud._create(
+                db, obj_in, picture=picture, picture_pending=picture is None)
+            if db_obj.picture_pending:
+                picture_enricher.enqueue(db_obj.id)
+            outbox_relay.notify()
             return db_obj
         except Exception as e:
             raise HTTPException(
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
 
-    def update(self, db: Session, obj_id, obj_in):
+    async def bulk_create(self, db: AsyncSession, objs_in: Sequence, batch_size: int = BULK_BATCH_SIZE) -> List[DogBulkResult]:
+        """
+            Create many database registers in a single transaction.
+
+            Names are lowercased and pictures taken from the reservoir as in
+            `create`, the registers left without one are enriched in the
+            background.
+
+            Args:
+            - db (AsyncSession): Database session.
+            - objs_in: Input data for the new registers.
+            - batch_size (int): Number of registers per INSERT statement.
+
+            Returns:
+            - One result per input register, in input order.
+
+            Raises:
+            - Exception: Any unexpected error during the database operation.
+        """
+        objs_in = [obj_in.copy(update={"name": obj_in.name.lower()}) for obj_in in objs_in]
+        pictures = [picture_provider.take() for _ in objs_in]
+        db_objs = await dog_crud._bulk_create(
+            db, objs_in, batch_size,
+            [{"picture": picture, "picture_pending": picture is None} for picture in pictures])
+        for db_obj in db_objs:
+            if db_obj.picture_pending:
+                picture_enricher.enqueue(db_obj.id)
+        outbox_relay.notify()
+        return [DogBulkResult(index=index, id=db_obj.id, status="created", task_id=db_obj.task_id)
+                for index, db_obj in enumerate(db_objs)]
+
+    async def bulk_update(self, db: AsyncSession, objs_in: Sequence, batch_size: int = BULK_BATCH_SIZE) -> List[DogBulkResult]:
+        """
+            Update many database registers by ID in a single transaction.
+
+            Args:
+            - db (AsyncSession): Database session.
+            - objs_in: Input data for the registers, each one with its `id`.
+            - batch_size (int): Number of registers per statement.
+
+            Returns:
+            - One result per input register, `updated` or `not_found`.
+        """
+        updated_ids = await dog_crud._bulk_update(db, objs_in, batch_size)
+        return [DogBulkResult(index=index, id=obj_in.id,
+                              status="updated" if obj_in.id in updated_ids else "not_found")
+                for index, obj_in in enumerate(objs_in)]
+
+    async def bulk_delete(self, db: AsyncSession, obj_ids: Sequence[int], batch_size: int = BULK_BATCH_SIZE) -> List[DogBulkResult]:
+        """
+            Delete many database registers by ID in a single transaction.
+
+            Args:
+            - db (AsyncSession): Database session.
+            - obj_ids: IDs of the registers to delete.
+            - batch_size (int): Number of IDs per DELETE statement.
+
+            Returns:
+            - One result per input ID, `deleted` or `not_found`.
+        """
+        deleted_ids = await dog_crud._bulk_delete(db, obj_ids, batch_size)
+        return [DogBulkResult(index=index, id=obj_id,
+                              status="deleted" if obj_id in deleted_ids else "not_found")
+                for index, obj_id in enumerate(obj_ids)]
+
+    async def update(self, db: AsyncSession, obj_id, obj_in):
         """
             Update a database register by ID.
 
             Args:
-            - db (Session): Database session.
+            - db (AsyncSession): Database session.
             - obj_id: ID of the register to update.
             - obj_in: Input data for updating the register.
 
@@ -117,22 +262,24 @@ class DogService():
             Raises:
             - Exception: Any unexpected error during the database operation.
         """
-        existing_obj = dog_crud._read(db, obj_id)
-        if not existing_obj:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND, detail="Dog not found")
         try:
-            return dog_crud._update(db, obj_id, obj_in)
+            db_obj = await dog_crud._update(db, obj_id, obj_in)
+        except HTTPException:
+            raise
         except Exception as e:
             raise HTTPException(
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
+        if db_obj is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND, detail="Dog not found")
+        return db_obj
 
-    def update_by_name(self, db: Session, obj_name: str, obj_in):
+    async def update_by_name(self, db: AsyncSession, obj_name: str, obj_in):
         """
             Update a database register by name.
 
             Args:
-            - db (Session): Database session.
+            - db (AsyncSession): Database session.
             - obj_name: Name of the register to update.
             - obj_in: Input data for updating the register.
 
@@ -142,22 +289,24 @@ class DogService():
             Raises:
             - Exception: Any unexpected error during the database operation.
         """
-        existing_obj = dog_crud._read_by_name(db, obj_name)
-        if not existing_obj:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND, detail="Dog not found")
         try:
-            return dog_crud._update_by_name(db, obj_name, obj_in)
+            db_obj = await dog_crud._update_by_name(db, obj_name, obj_in)
+        except HTTPException:
+            raise
         except Exception as e:
             raise HTTPException(
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
+        if db_obj is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND, detail="Dog not found")
+        return db_obj
 
-    def delete(self, db: Session, obj_id):
+    async def delete(self, db: AsyncSession, obj_id):
         """
             Delete a database record by ID.
 
             Args:
-            - db (Session): Database session.
+            - db (AsyncSession): Database session.
             - obj_id: ID of the record to delete.
 
             Returns:
@@ -166,22 +315,24 @@ class DogService():
             Raises:
             - Exception: Any unexpected error during the database operation.
         """
-        existing_obj = dog_crud._read(db, obj_id)
-        if not existing_obj:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND, detail="Dog not found")
         try:
-            return dog_crud._delete(db, obj_id)
+            db_obj = await dog_crud._delete(db, obj_id)
+        except HTTPException:
+            raise
         except Exception as e:
             raise HTTPException(
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
+        if db_obj is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND, detail="Dog not found")
+        return db_obj
 
-    def delete_by_name(self, db: Session, obj_name: str):
+    async def delete_by_name(self, db: AsyncSession, obj_name: str):
         """
             Delete a database record by name.
 
             Args:
-            - db (Session): Database session.
+            - db (AsyncSession): Database session.
             - obj_name: Name of the record to delete.
 
             Returns:
@@ -190,15 +341,17 @@ class DogService():
             Raises:
             - Exception: Any unexpected error during the database operation.
         """
-        existing_obj = dog_crud._read_by_name(db, obj_name)
-        if not existing_obj:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND, detail="Dog not found")
         try:
-            return dog_crud._delete_by_name(db, obj_name)
+            db_obj = await dog_crud._delete_by_name(db, obj_name)
+        except HTTPException:
+            raise
         except Exception as e:
             raise HTTPException(
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
+        if db_obj is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND, detail="Dog not found")
+        return db_obj
 
 
 dog_service = DogService()
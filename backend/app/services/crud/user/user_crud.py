@@ -1,23 +1,229 @@
+import os
+from collections import defaultdict
+# SQLAlchemy imports
+from sqlalchemy import func, inspect, select, update
+from sqlalchemy.orm import aliased, joinedload, noload, selectinload
+from sqlalchemy.orm.attributes import set_committed_value
+# Typing imports
+from typing import List, Optional, Sequence
+# dotenv imports
+from dotenv import load_dotenv
 # Local imports
+from app.models.dog import Dog
 from app.models.user import User
+from app.schemas.user import UserResponse
+from app.services.cache import cache
 from app.services.crud.crud_service import BASECrud
+from app.services.crud.dog.dog_crud import dog_crud
+
+load_dotenv()
+# Maximum number of dogs loaded with each user, 0 loads them all
+USER_DOGS_LIMIT = int(os.getenv("USER_DOGS_LIMIT", 100)) or None
+# Strategies to load the dogs of the users
+DOG_LOADERS = ("selectin", "joined")
+# How the hashed password is serialized, as pydantic does with SecretStr
+SECRET_MASK = "**********"
 
 
 class UserCrud(BASECrud):
-    def __init__(self, model=User):
-        super().__init__(model)
-    
-    def _read_by_email(self, db, email):
+    def __init__(self, model=User, schema=UserResponse):
+        super().__init__(model, schema)
+
+    def _cache_keys(self, db_obj) -> List[str]:
+        """
+            Cache keys to invalidate when a user changes, the user and its
+            dogs, as deleting a user clears their owner.
+        """
+        keys = super()._cache_keys(db_obj)
+        # Only the dogs already loaded, reading the attribute would lazy load them
+        dogs = inspect(db_obj).attrs.dog.loaded_value
+        if isinstance(dogs, list):
+            keys.extend(f"dog:id:{dog.id}" for dog in dogs)
+        return keys
+
+    def _capped_dogs(self, user_ids, dogs_limit: int):
+        """
+            Dog alias over the first `dogs_limit` dogs (by ID) of each of the
+            `user_ids`, ranked with a window function.
+        """
+        position = func.row_number().over(partition_by=Dog.user_id, order_by=Dog.id).label("position")
+        ranked = select(Dog, position).filter(Dog.user_id.in_(user_ids)).subquery()
+        return aliased(Dog, select(ranked).filter(ranked.c.position <= dogs_limit).subquery())
+
+    def _dog_options(self, load: str, dogs_limit: Optional[int], user_ids) -> list:
+        """
+            Loader options for the dogs of the users.
+
+            "joined" loads the users and their dogs in the same query, it fits
+            a single user. "selectin" loads the dogs of all the users with one
+            extra query, it fits lists as it does not repeat the user columns
+            for each dog. With a cap the "selectin" dogs are loaded by
+            `_load_dogs` after the users.
+        """
+        if load not in DOG_LOADERS:
+            raise ValueError(f"Unknown dog loader: {load}")
+        if load == "joined":
+            if dogs_limit is None:
+                return [joinedload(self.model.dog)]
+            return [joinedload(self.model.dog.of_type(self._capped_dogs(user_ids, dogs_limit)))]
+        if dogs_limit is None:
+            return [selectinload(self.model.dog)]
+        return [noload(self.model.dog)]
+
+    async def _load_dogs(self, db, db_objs, dogs_limit: Optional[int] = USER_DOGS_LIMIT):
+        """
+            Load the dogs of every user with one query, the first `dogs_limit`
+            of each one or all of them when None.
+        """
+        user_ids = [db_obj.id for db_obj in db_objs]
+        if dogs_limit is None:
+            query = select(Dog).filter(Dog.user_id.in_(user_ids)).order_by(Dog.user_id, Dog.id)
+        else:
+            capped = self._capped_dogs(user_ids, dogs_limit)
+            query = select(capped).order_by(capped.user_id, capped.id)
+        result = await db.execute(query)
+        dogs = defaultdict(list)
+        for dog in result.scalars():
+            dogs[dog.user_id].append(dog)
+        for db_obj in db_objs:
+            set_committed_value(db_obj, "dog", dogs[db_obj.id])
+
+    async def _read(self, db, obj_id, load: str = "joined", dogs_limit: Optional[int] = USER_DOGS_LIMIT):
+        """
+            Retrieve a user by ID with their dogs.
+
+            Args:
+            - db (AsyncSession): Database session.
+            - obj_id: ID of the user to retrieve.
+            - load (str): Strategy to load the dogs, "joined" or "selectin".
+            - dogs_limit (int): Maximum number of dogs loaded, None for all.
+
+            Returns:
+            - The retrieved user or None if not found.
+        """
+        db_obj = await super()._read(db, obj_id, self._dog_options(load, dogs_limit, [obj_id]))
+        if db_obj is not None and load == "selectin" and dogs_limit is not None:
+            await self._load_dogs(db, [db_obj], dogs_limit)
+        return db_obj
+
+    async def _read_all(self, db, skip: int = 0, limit: int = 10, cursor: Optional[str] = None,
+                        load: str = "selectin", dogs_limit: Optional[int] = USER_DOGS_LIMIT):
+        """
+            Retrieve a page of users with their dogs in a constant number of
+            queries, whatever the page size.
+
+            Args:
+            - db (AsyncSession): Database session.
+            - skip (int): Number of users to skip.
+            - limit (int): Maximum number of users to retrieve.
+            - cursor (str): Opaque cursor returned by the previous page.
+            - load (str): Strategy to load the dogs, "selectin" or "joined".
+            - dogs_limit (int): Maximum number of dogs loaded per user, None for all.
+
+            Returns:
+            - List of retrieved users ordered by ID.
+        """
+        page_ids = self._paginate(select(self.model.id), skip, limit, cursor)
+        db_objs = await super()._read_all(
+            db, skip, limit, cursor, self._dog_options(load, dogs_limit, page_ids))
+        if db_objs and load == "selectin" and dogs_limit is not None:
+            await self._load_dogs(db, db_objs, dogs_limit)
+        return db_objs
+
+    async def _read_all_rows(self, db, skip: int = 0, limit: int = 10, cursor: Optional[str] = None,
+                             fields: Optional[Sequence[str]] = None,
+                             dogs_limit: Optional[int] = USER_DOGS_LIMIT) -> List[dict]:
+        """
+            Retrieve a page of users as plain dicts, for the fast serialization
+            path and the sparse fieldsets. Their dogs are only read, with one
+            extra query capped as in `_read_all`, when the "dog" field is
+            selected, and the hashed password is masked.
+
+            Args:
+            - db (AsyncSession): Database session.
+            - skip (int): Number of users to skip.
+            - limit (int): Maximum number of users to retrieve.
+            - cursor (str): Opaque cursor returned by the previous page.
+            - fields: Fields to select, every field of UserResponse by default.
+            - dogs_limit (int): Maximum number of dogs per user, None for all.
+
+            Returns:
+            - List of dicts ordered by ID.
+        """
+        rows = await super()._read_all_rows(db, skip, limit, cursor, fields)
+        for row in rows:
+            if "hashed_password" in row:
+                row["hashed_password"] = SECRET_MASK
+        if not rows or (fields is not None and "dog" not in fields):
+            return rows
+        user_ids = [row["id"] for row in rows]
+        dog = self._capped_dogs(user_ids, dogs_limit) if dogs_limit is not None else Dog
+        columns = [getattr(dog, column.name) for column in dog_crud._columns()]
+        query = select(*columns)
+        if dogs_limit is None:
+            query = query.filter(Dog.user_id.in_(user_ids))
+        result = await db.execute(query.order_by(dog.user_id, dog.id))
+        dogs = defaultdict(list)
+        for dog_row in result.mappings():
+            dogs[dog_row["user_id"]].append(dict(dog_row))
+        for row in rows:
+            row["dog"] = dogs[row["id"]]
+        return rows
+
+    async def _update(self, db, obj_id, obj_in, dogs_limit: Optional[int] = USER_DOGS_LIMIT):
+        """
+            Update a user by ID, returned with their dogs as `_read` does.
+
+            Args:
+            - db (AsyncSession): Database session.
+            - obj_id: ID of the user to update.
+            - obj_in: Input data for updating the user.
+            - dogs_limit (int): Maximum number of dogs loaded, None for all.
+
+            Returns:
+            - The updated user or None if not found.
+        """
+        db_obj = await super()._update(db, obj_id, obj_in)
+        if db_obj is not None:
+            await self._load_dogs(db, [db_obj], dogs_limit)
+        return db_obj
+
+    async def _delete(self, db, obj_id):
+        """
+            Delete a user by ID, clearing the owner of their dogs first.
+
+            The ORM does this when the user is loaded, with DELETE ... RETURNING
+            it is one extra UPDATE in the same transaction.
+
+            Args:
+            - db (AsyncSession): Database session.
+            - obj_id: ID of the user to delete.
+
+            Returns:
+            - The deleted user or None if not found.
+        """
+        dog_ids = []
+        if self._supports_returning(db):
+            result = await db.execute(
+                update(Dog).filter(Dog.user_id == obj_id).values(user_id=None).returning(Dog.id))
+            dog_ids = result.scalars().all()
+        db_obj = await super()._delete(db, obj_id)
+        await cache.delete(*[f"dog:id:{dog_id}" for dog_id in dog_ids])
+        return db_obj
+
+    async def _read_by_email(self, db, email):
         """
             Retrieve a user by email.
 
             Args:
-            - db (Session): Database session.
+            - db (AsyncSession): Database session.
             - email: Email of the user to retrieve.
 
             Returns:
             - The retrieved user or None if not found.
         """
-        return db.query(self.model).filter(self.model.email == email).first()
+        result = await db.execute(
+            select(self.model).filter(self.model.email == email))
+        return result.scalars().first()
 
 user_crud = UserCrud()
@@ -1,10 +1,11 @@
 # FastAPI imports
 from fastapi import status, HTTPException
 # SQLAlchemy imports
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm.attributes import set_committed_value
 # Typing imports
-from typing import List
+from typing import List, Optional, Sequence
 # Local imports
 from app.services.security import jwt_token
 from app.schemas.user import UserResponse, UserUpdate, UserCreate
@@ -14,14 +15,15 @@ from .user_crud import user_crud
 
 class UserService():
 
-    def read_all(self, db: Session, skip: int, limit: int) -> List[UserResponse]:
+    async def read_all(self, db: AsyncSession, skip: int, limit: int, cursor: Optional[str] = None) -> List[UserResponse]:
         """
             Retrieve a list of users from the database.
 
             Args:
-            - db (Session): Database session.
+            - db (AsyncSession): Database session.
             - skip (int): Number of records to skip.
             - limit (int): Maximum number of records to retrieve.
+            - cursor (str): Cursor of the page to retrieve, replaces skip when given.
 
             Returns:
             - List[UserResponse]: A list of user records.
@@ -31,21 +33,54 @@ class UserService():
             - HTTPException 500 Internal Server Error: If an unexpected error occurs during the database operation.
         """
         try:
-            db_objs = user_crud._read_all(db, skip, limit)
+            db_objs = await user_crud._read_all(db, skip, limit, cursor, load="selectin")
             if not db_objs:
                 raise HTTPException(
                     status_code=status.HTTP_404_NOT_FOUND, detail="Users not found")
             return db_objs
+        except HTTPException:
+            raise
         except Exception as e:
             raise HTTPException(
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
 
-    def create(self, db: Session, obj_in: UserCreate) -> UserResponse:
+    async def read_all_rows(self, db: AsyncSession, skip: int, limit: int, cursor: Optional[str] = None,
+                            fields: Optional[Sequence[str]] = None) -> List[dict]:
+        """
+            Retrieve a page of users as plain dicts, for the fast serialization path and the sparse fieldsets.
+
+            Args:
+            - db (AsyncSession): Database session.
+            - skip (int): Number of records to skip.
+            - limit (int): Maximum number of records to retrieve.
+            - cursor (str): Cursor of the page to retrieve, replaces skip when given.
+            - fields: UserResponse fields to return, all by default.
+
+            Returns:
+            - List of dicts of the UserResponse fields, the hashed password masked.
+
+            Raises:
+            - HTTPException 404 Not Found: If no users are found in the specified range.
+            - HTTPException 500 Internal Server Error: If an unexpected error occurs during the database operation.
+        """
+        try:
+            rows = await user_crud._read_all_rows(db, skip, limit, cursor, fields)
+        except HTTPException:
+            raise
+        except Exception as e:
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
+        if not rows:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND, detail="Users not found")
+        return rows
+
+    async def create(self, db: AsyncSession, obj_in: UserCreate) -> UserResponse:
         """
             Create a new user in the database.
 
             Args:
-            - db (Session): Database session.
+            - db (AsyncSession): Database session.
             - obj_in (UserCreate): Input data for creating a new user.
 
             Returns:
@@ -56,12 +91,12 @@ class UserService():
             - HTTPException 500 Internal Server Error: If an unexpected error occurs during the database operation.
         """
         # Check if the email is already registered
-        existing_obj = user_crud._read_by_email(db, obj_in.email)
+        existing_obj = await user_crud._read_by_email(db, obj_in.email)
         if existing_obj:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST, detail="Email already registered")
         try:
-            hashed_password = jwt_token.get_password_hash(obj_in.password)
+            hashed_password = await jwt_token.get_password_hash_async(obj_in.password)
             data = {
                 "email": obj_in.email,
                 "name": obj_in.name.lower(),
@@ -70,23 +105,25 @@ class UserService():
             }
             db_obj = User(**data)
             db.add(db_obj)
-            db.commit()
-            db.refresh(db_obj)
+            await db.commit()
+            await db.refresh(db_obj)
+            # A new user has no dogs yet, no need to query them
+            set_committed_value(db_obj, "dog", [])
             return db_obj
         except IntegrityError as e:
-            db.rollback()
+            await db.rollback()
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST, detail="Email already registered")
         except Exception as e:
             raise HTTPException(
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
 
-    def update(self, db: Session, obj_id: int, obj_in: UserUpdate) -> UserResponse:
+    async def update(self, db: AsyncSession, obj_id: int, obj_in: UserUpdate) -> UserResponse:
         """
             Update a user in the database.
 
             Args:
-            - db (Session): Database session.
+            - db (AsyncSession): Database session.
             - obj_id (int): ID of the user to be updated.
             - obj_in: (UserUpdate) Input data for updating the user.
 
@@ -97,23 +134,26 @@ class UserService():
             - HTTPException 404 Not Found: If the user with the specified ID is not found.
             - HTTPException 500 Internal Server Error: If an unexpected error occurs during the database operation.
         """
-        # Check if the user exists in the database
-        existing_obj = user_crud._read(db, obj_id)
-        if not existing_obj:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
         try:
-            return user_crud._update(db, obj_id, obj_in)
+            db_obj = await user_crud._update(db, obj_id, obj_in)
+        except HTTPException:
+            raise
         except Exception as e:
             raise HTTPException(
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
+        # The statement matched no row, the user does not exist
+        if db_obj is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
+        jwt_token.invalidate_user(obj_id)
+        return db_obj
 
-    def delete(self, db: Session, obj_id: int):
+    async def delete(self, db: AsyncSession, obj_id: int):
         """
             Delete an existing user from the database.
 
             Args:
-            - db (Session): Database session.
+            - db (AsyncSession): Database session.
             - obj_id (int): ID of the user to be deleted.
 
             Returns:
@@ -123,23 +163,26 @@ class UserService():
             - HTTPException 404 Not Found: If the user with the specified ID is not found.
             - HTTPException 500 Internal Server Error: If an unexpected error occurs during the database operation.
         """
-        # Check if the user exists in the database
-        existing_obj = user_crud._read(db, obj_id)
-        if not existing_obj:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
         try:
-            return user_crud._delete(db, obj_id)
+            db_obj = await user_crud._delete(db, obj_id)
+        except HTTPException:
+            raise
         except Exception as e:
             raise HTTPException(
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
+        # The statement matched no row, the user does not exist
+        if db_obj is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
+        jwt_token.invalidate_user(obj_id)
+        return db_obj
 
-    def read(self, db: Session, obj_id: int) -> UserResponse:
+    async def read(self, db: AsyncSession, obj_id: int) -> UserResponse:
         """
             Retrieve a user by ID from the database.
 
             Args:
-            - db (Session): Database session.
+            - db (AsyncSession): Database session.
             - obj_id (int): ID of the user to_ be retrieved.
 
             Returns:
@@ -150,11 +193,13 @@ class UserService():
             - HTTPException 500 Internal Server Error: If an unexpected error occurs during the database operation.
         """
         try:
-            db_obj = user_crud._read(db, obj_id)
+            db_obj = await user_crud._read_cached(db, obj_id)
             if not db_obj:
                 raise HTTPException(
                     status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
             return db_obj
+        except HTTPException:
+            raise
         except Exception as e:
             raise HTTPException(
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
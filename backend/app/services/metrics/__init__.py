@@ -0,0 +1,4 @@
+from .metrics import (
+    registry, http_requests, http_request_duration, http_requests_in_flight,
+    celery_publish_duration, celery_publish_errors, outbox_events_published,
+    dog_picture_fetch_duration)
@@ -0,0 +1,71 @@
+"""
+    Export the counters kept by the connection pools, the cache and the change feed.
+"""
+# Local imports
+from app.db.database import (
+    async_engine, async_pool_metrics, engine, pool_metrics, replica_engines, replica_pool_metrics)
+from app.db.pool import WAIT_BUCKETS
+from app.db.replicas import replica_router
+from app.services.cache import cache
+from app.services.changes import change_feed
+from .metrics import registry
+
+
+def _pools():
+    yield "async", async_pool_metrics.snapshot(async_engine.sync_engine.pool)
+    yield "sync", pool_metrics.snapshot(engine.pool)
+    for i, (replica, metrics) in enumerate(zip(replica_engines, replica_pool_metrics)):
+        yield f"replica{i}", metrics.snapshot(replica.sync_engine.pool)
+
+
+def _pool_samples(field: str):
+    def callback():
+        for name, snapshot in _pools():
+            yield "", {"engine": name}, snapshot[field]
+    return callback
+
+
+def _pool_wait_samples():
+    for name, snapshot in _pools():
+        for bound in WAIT_BUCKETS:
+            yield "_bucket", {"engine": name, "le": repr(float(bound))}, snapshot["wait_buckets"][str(bound)]
+        yield "_bucket", {"engine": name, "le": "+Inf"}, snapshot["waits"]
+        yield "_sum", {"engine": name}, snapshot["wait_seconds_total"]
+        yield "_count", {"engine": name}, snapshot["waits"]
+
+
+def _cache_samples(field: str):
+    def callback():
+        yield "", {}, cache.stats()[field]
+    return callback
+
+
+for field, documentation in (
+        ("checked_out", "Connections checked out of the pool."),
+        ("idle", "Idle connections in the pool."),
+        ("overflow", "Connections open beyond the pool size.")):
+    registry.collector(f"db_pool_{field}", documentation, "gauge", _pool_samples(field))
+for field, documentation in (
+        ("connects", "Connections opened by the pool since startup."),
+        ("checkouts", "Connections checked out of the pool since startup."),
+        ("invalidations", "Connections invalidated by the pool since startup."),
+        ("timeouts", "Checkouts that timed out waiting for a connection since startup.")):
+    registry.collector(f"db_pool_{field}_total", documentation, "counter", _pool_samples(field))
+registry.collector(
+    "db_pool_wait_seconds", "Time waited to get a connection from the pool.", "histogram", _pool_wait_samples)
+registry.collector(
+    "db_replicas_healthy", "Read replicas passing their health check.", "gauge",
+    lambda: [("", {}, replica_router.stats()["healthy"])])
+for field, documentation in (
+        ("hits", "Lookups served by the local cache."),
+        ("shared_hits", "Lookups served by the shared cache."),
+        ("misses", "Lookups missing both cache tiers."),
+        ("evictions", "Entries evicted from the local cache.")):
+    registry.collector(f"cache_{field}_total", documentation, "counter", _cache_samples(field))
+registry.collector("cache_size", "Entries in the local cache.", "gauge", _cache_samples("size"))
+registry.collector(
+    "dog_changes_subscribers", "Clients following the dog change feed.", "gauge",
+    lambda: [("", {}, change_feed.stats()["subscribers"])])
+registry.collector(
+    "dog_changes_dropped_total", "Change feed clients disconnected for falling behind.", "counter",
+    lambda: [("", {}, change_feed.stats()["dropped"])])
@@ -0,0 +1,25 @@
+# Local imports
+from .registry import Registry
+
+registry = Registry()
+
+# HTTP requests, recorded by the metrics middleware
+http_requests = registry.counter(
+    "http_requests_total", "HTTP requests by method, templated route and status code.",
+    ("method", "route", "status"))
+http_request_duration = registry.histogram(
+    "http_request_duration_seconds", "HTTP request latency by method and templated route.",
+    ("method", "route"))
+http_requests_in_flight = registry.gauge(
+    "http_requests_in_flight", "HTTP requests being served by method and templated route.",
+    ("method", "route"))
+# Celery task publishing
+celery_publish_duration = registry.histogram(
+    "celery_publish_duration_seconds", "Latency of publishing a Celery task to the broker.", ("task",))
+celery_publish_errors = registry.counter(
+    "celery_publish_errors_total", "Celery tasks that could not be published.", ("task",))
+outbox_events_published = registry.counter(
+    "outbox_events_published_total", "Outbox events relayed to the broker.", ("task",))
+# Outbound dog.ceo requests
+dog_picture_fetch_duration = registry.histogram(
+    "dog_picture_fetch_duration_seconds", "Latency of the dog picture API requests by outcome.", ("outcome",))
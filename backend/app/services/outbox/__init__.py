@@ -0,0 +1 @@
+from .relay import add_events, outbox_relay
@@ -0,0 +1,194 @@
+import os
+import uuid
+import asyncio
+# SQLAlchemy imports
+from sqlalchemy import delete, insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+# Typing imports
+from typing import List, Optional, Sequence, Tuple
+# dotenv imports
+from dotenv import load_dotenv
+# Local imports
+from app.core.celery import celery
+from app.core.tasks import BATCH_TASKS
+from app.db.database import AsyncSessionLocal, async_engine
+from app.models.outbox import OutboxEvent
+from app.services.metrics import celery_publish_duration, celery_publish_errors, outbox_events_published
+from app.utils.database import logger
+
+load_dotenv()
+# Maximum number of events published per batch, over one broker connection
+OUTBOX_BATCH_SIZE = int(os.getenv("OUTBOX_BATCH_SIZE", "100"))
+# Seconds between polls when no event was notified
+OUTBOX_POLL_INTERVAL_SECONDS = float(os.getenv("OUTBOX_POLL_INTERVAL_SECONDS", "1"))
+# Maximum number of events merged into one message of a batch task
+OUTBOX_TASK_BATCH_SIZE = int(os.getenv("OUTBOX_TASK_BATCH_SIZE", "100"))
+# Seconds to wait after a notification, so a burst of commits is relayed together
+OUTBOX_LINGER_SECONDS = float(os.getenv("OUTBOX_LINGER_SECONDS", "0.05"))
+# Upper bound of the retry delay while the broker is unreachable
+OUTBOX_MAX_BACKOFF_SECONDS = float(os.getenv("OUTBOX_MAX_BACKOFF_SECONDS", "30"))
+
+
+async def add_events(db: AsyncSession, task_name: str, payloads: Sequence[dict]) -> List[str]:
+    """
+        Add Celery tasks to the outbox with one multi-row INSERT, in the
+        transaction of the session.
+
+        The task IDs are generated here, so they are known without reading
+        the rows back. The tasks are only published by the relay once the
+        transaction commits, and are lost with it on rollback.
+
+        Args:
+        - db (AsyncSession): Database session of the change.
+        - task_name (str): Name of the Celery task.
+        - payloads: Keyword arguments of each task, JSON serializable.
+
+        Returns:
+        - The IDs the tasks will be published with, in payload order.
+    """
+    if not payloads:
+        return []
+    task_ids = [str(uuid.uuid4()) for _ in payloads]
+    await db.execute(insert(OutboxEvent).values([
+        {"task_id": task_id, "task_name": task_name, "payload": payload}
+        for task_id, payload in zip(task_ids, payloads)]))
+    return task_ids
+
+
+class OutboxRelay():
+    """
+        In-process background worker that publishes the outbox to the broker.
+
+        Events are read in batches, oldest first, published over a single
+        producer connection and deleted in the same transaction. Events of a
+        task in `BATCH_TASKS` are merged, up to `task_batch_size` per
+        message, into its batch task, which keeps the task ID of every
+        event for its results. Delivery is
+        at least once: an event published right before a crash is published
+        again, with the same task ID. On PostgreSQL the batch is locked with
+        SKIP LOCKED so several app processes can relay the same table.
+    """
+
+    def __init__(self, batch_size: int = OUTBOX_BATCH_SIZE,
+                 task_batch_size: int = OUTBOX_TASK_BATCH_SIZE,
+                 interval: float = OUTBOX_POLL_INTERVAL_SECONDS,
+                 linger: float = OUTBOX_LINGER_SECONDS,
+                 max_backoff: float = OUTBOX_MAX_BACKOFF_SECONDS):
+        self.batch_size = batch_size
+        self.task_batch_size = task_batch_size
+        self.interval = interval
+        self.linger = linger
+        self.max_backoff = max_backoff
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self):
+        """
+            Start relaying, events left from a previous run are published first.
+        """
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """
+            Stop relaying, pending events stay in the outbox for the next start.
+        """
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+        self._wakeup = None
+
+    def notify(self):
+        """
+            Wake the relay up after committing new events, instead of waiting for the next poll.
+        """
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def relay(self) -> int:
+        """
+            Publish one batch of events and delete the published ones.
+
+            Returns:
+            - Number of events published.
+
+            Raises:
+            - Exception: If the database or the broker can not be reached.
+        """
+        query = select(OutboxEvent.id, OutboxEvent.task_id, OutboxEvent.task_name, OutboxEvent.payload) \
+            .order_by(OutboxEvent.id).limit(self.batch_size)
+        if async_engine.dialect.name == "postgresql":
+            query = query.with_for_update(skip_locked=True)
+        async with AsyncSessionLocal(bind=async_engine) as db:
+            events = (await db.execute(query)).all()
+            if not events:
+                return 0
+            # Publishing blocks on the broker, keep it off the event loop
+            published = await asyncio.get_running_loop().run_in_executor(None, self._publish, events)
+            if published:
+                await db.execute(delete(OutboxEvent).where(OutboxEvent.id.in_(published)))
+            await db.commit()
+        if len(published) < len(events):
+            raise RuntimeError(f"{len(events) - len(published)} outbox events could not be published")
+        return len(published)
+
+    def _messages(self, events: Sequence[Tuple]) -> List[Tuple[List[int], str, dict, str]]:
+        """
+            Group the events into messages of (event IDs, task name, kwargs, task ID).
+        """
+        messages = []
+        batches = {}
+        for event_id, task_id, task_name, payload in events:
+            batch_name = BATCH_TASKS.get(task_name)
+            if batch_name is None:
+                messages.append(([event_id], task_name, payload, task_id))
+                continue
+            message = batches.get(batch_name)
+            if message is None or len(message[0]) >= self.task_batch_size:
+                message = batches[batch_name] = ([], batch_name, {"items": []}, str(uuid.uuid4()))
+                messages.append(message)
+            message[0].append(event_id)
+            message[2]["items"].append({"task_id": task_id, **payload})
+        return messages
+
+    def _publish(self, events: Sequence[Tuple]) -> List[int]:
+        published = []
+        names = {event[0]: event[2] for event in events}
+        with celery.producer_or_acquire() as producer:
+            for event_ids, task_name, kwargs, task_id in self._messages(events):
+                # Stop at the first failure so events keep their order
+                with celery_publish_duration.time(task=task_name):
+                    try:
+                        celery.send_task(task_name, kwargs=kwargs, task_id=task_id, producer=producer)
+                    except Exception as e:
+                        celery_publish_errors.inc(task=task_name)
+                        logger.error(f"Error publishing outbox events {event_ids[0]}..{event_ids[-1]}: {e}")
+                        break
+                for event_id in event_ids:
+                    outbox_events_published.inc(task=names[event_id])
+                published.extend(event_ids)
+        return published
+
+    async def _run(self):
+        backoff = self.interval
+        while True:
+            self._wakeup.clear()
+            try:
+                count = await self.relay()
+            except Exception as e:
+                logger.error(f"Error relaying the outbox, retrying in {backoff}s: {e}")
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, self.max_backoff)
+                continue
+            backoff = self.interval
+            if count >= self.batch_size:
+                continue
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.interval)
+                await asyncio.sleep(self.linger)
+            except asyncio.TimeoutError:
+                pass
+
+
+outbox_relay = OutboxRelay()
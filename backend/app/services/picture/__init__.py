@@ -0,0 +1,2 @@
+from .provider import picture_provider
+from .enrichment import picture_enricher
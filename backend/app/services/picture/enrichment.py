@@ -0,0 +1,125 @@
+import os
+import asyncio
+# HTTPX imports
+import httpx
+# SQLAlchemy imports
+from sqlalchemy import select
+# Typing imports
+from typing import Dict, List, Optional
+# dotenv imports
+from dotenv import load_dotenv
+# Local imports
+from app.db.database import AsyncSessionLocal
+from app.models.dog import Dog
+from app.services.crud.dog.dog_crud import dog_crud
+from app.utils.database import logger
+from .provider import picture_provider
+
+load_dotenv()
+# Number of concurrent enrichment workers
+PICTURE_WORKERS = int(os.getenv("PICTURE_WORKERS", "4"))
+# Attempts to get a picture before queueing the dog again later
+PICTURE_RETRIES = int(os.getenv("PICTURE_RETRIES", "3"))
+# Seconds before a dog that ran out of attempts is queued again
+PICTURE_REQUEUE_SECONDS = float(os.getenv("PICTURE_REQUEUE_SECONDS", "60"))
+
+
+class PictureEnricher():
+    """
+        In-process background worker that fills the picture of new dogs.
+
+        Dogs created while the picture reservoir is empty get
+        `picture_pending=True` and their ID is queued here. Workers get a
+        picture from the picture provider and store it, clearing the flag,
+        which change feed subscribers receive as an update.
+        A dog that runs out of attempts is queued again after
+        `requeue_seconds`, and dogs still pending when the app starts are
+        queued again, so no dog stays pending for good.
+    """
+
+    def __init__(self, workers: int = PICTURE_WORKERS, retries: int = PICTURE_RETRIES,
+                 requeue_seconds: float = PICTURE_REQUEUE_SECONDS):
+        self.workers = workers
+        self.retries = retries
+        self.requeue_seconds = requeue_seconds
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+        self._requeues: Dict[int, asyncio.TimerHandle] = {}
+
+    async def start(self):
+        """
+            Start the workers and queue every dog still waiting for a picture.
+        """
+        self._queue = asyncio.Queue()
+        self._tasks = [asyncio.create_task(self._work()) for _ in range(self.workers)]
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(select(Dog.id).filter(Dog.picture_pending.is_(True)))
+            for dog_id in result.scalars().all():
+                self.enqueue(dog_id)
+
+    async def stop(self):
+        """
+            Stop the workers, pending dogs are picked up again on next start.
+        """
+        for handle in self._requeues.values():
+            handle.cancel()
+        self._requeues.clear()
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._queue = None
+
+    def enqueue(self, dog_id: int):
+        """
+            Queue a dog to get its picture.
+
+            Args:
+            - dog_id (int): ID of the dog.
+        """
+        self._requeues.pop(dog_id, None)
+        if self._queue is None:
+            logger.warning(f"Picture enricher not running, dog {dog_id} stays pending")
+            return
+        self._queue.put_nowait(dog_id)
+
+    def _requeue(self, dog_id: int):
+        """
+            Queue a dog again after `requeue_seconds`, once at a time.
+        """
+        if self._queue is None or dog_id in self._requeues:
+            return
+        logger.warning(f"No picture for dog {dog_id}, retrying in {self.requeue_seconds}s")
+        self._requeues[dog_id] = asyncio.get_running_loop().call_later(
+            self.requeue_seconds, self.enqueue, dog_id)
+
+    async def _enrich(self, dog_id: int):
+        for attempt in range(1, self.retries + 1):
+            try:
+                picture = await picture_provider.get()
+                break
+            except (httpx.HTTPError, KeyError, ValueError) as e:
+                logger.warning(f"Error getting image for dog {dog_id} (attempt {attempt}): {e}")
+                if attempt < self.retries:
+                    await asyncio.sleep(2 ** attempt)
+        else:
+            self._requeue(dog_id)
+            return
+        # Written as any dog update, so the cache of the dog and its owner is
+        # cleared and the change feed notified
+        async with AsyncSessionLocal() as db:
+            await dog_crud._update_where(db, Dog.id == dog_id, {"picture": picture, "picture_pending": False})
+
+    async def _work(self):
+        while True:
+            dog_id = await self._queue.get()
+            try:
+                await self._enrich(dog_id)
+            except Exception as e:
+                logger.error(f"Error enriching dog {dog_id}: {e}")
+                self._requeue(dog_id)
+            finally:
+                self._queue.task_done()
+
+
+picture_enricher = PictureEnricher()
@@ -0,0 +1,137 @@
+import os
+import time
+import asyncio
+from collections import deque
+# HTTPX imports
+import httpx
+# Typing imports
+from typing import List, Optional
+# dotenv imports
+from dotenv import load_dotenv
+# Local imports
+from app.utils.database import logger
+from app.services.metrics import dog_picture_fetch_duration
+
+load_dotenv()
+# Upstream random image endpoint, point it to a local stub in tests and benchmarks
+DOG_PICTURE_URL = os.getenv("DOG_PICTURE_URL", "https://dog.ceo/api/breeds/image/random")
+# Maximum number of prefetched picture URLs kept in memory
+PICTURE_RESERVOIR_SIZE = int(os.getenv("PICTURE_RESERVOIR_SIZE", "50"))
+# Refill the reservoir when it holds fewer URLs than this
+PICTURE_RESERVOIR_LOW = int(os.getenv("PICTURE_RESERVOIR_LOW", "10"))
+# Maximum URLs requested per upstream call (dog.ceo allows up to 50)
+PICTURE_FETCH_BATCH = int(os.getenv("PICTURE_FETCH_BATCH", "50"))
+
+
+class PictureProvider():
+    """
+        Source of random dog picture URLs.
+
+        Holds one keep-alive HTTP client for the whole app and a bounded
+        reservoir of prefetched URLs that a background task refills, so
+        callers normally get a picture without waiting on the network.
+    """
+
+    def __init__(self, url: str = DOG_PICTURE_URL, size: int = PICTURE_RESERVOIR_SIZE,
+                 low: int = PICTURE_RESERVOIR_LOW, batch: int = PICTURE_FETCH_BATCH):
+        self.url = url.rstrip("/")
+        self.size = size
+        self.low = low
+        self.batch = batch
+        self._reservoir = deque(maxlen=size)
+        self._client: Optional[httpx.AsyncClient] = None
+        self._refill_needed: Optional[asyncio.Event] = None
+        self._refill_task: Optional[asyncio.Task] = None
+
+    async def start(self):
+        """
+            Open the shared client and start filling the reservoir.
+        """
+        self._client = httpx.AsyncClient(
+            timeout=10, limits=httpx.Limits(max_keepalive_connections=10, max_connections=20))
+        self._refill_needed = asyncio.Event()
+        self._refill_needed.set()
+        self._refill_task = asyncio.create_task(self._refill())
+
+    async def stop(self):
+        """
+            Stop the refill task and close the shared client.
+        """
+        if self._refill_task:
+            self._refill_task.cancel()
+            await asyncio.gather(self._refill_task, return_exceptions=True)
+            self._refill_task = None
+        if self._client:
+            await self._client.aclose()
+            self._client = None
+
+    def take(self) -> Optional[str]:
+        """
+            Take a prefetched picture URL without waiting.
+
+            Returns:
+            - str: A picture URL, or None when the reservoir is empty.
+        """
+        picture = self._reservoir.popleft() if self._reservoir else None
+        if len(self._reservoir) < self.low and self._refill_needed:
+            self._refill_needed.set()
+        return picture
+
+    async def get(self) -> str:
+        """
+            Get a picture URL, from the reservoir or from upstream if empty.
+
+            Returns:
+            - str: A picture URL.
+
+            Raises:
+            - httpx.HTTPError: If the upstream call fails.
+        """
+        picture = self.take()
+        if picture:
+            return picture
+        return (await self.fetch(1))[0]
+
+    async def fetch(self, count: int) -> List[str]:
+        """
+            Request `count` random picture URLs from upstream.
+
+            Args:
+            - count (int): Number of URLs to request.
+
+            Returns:
+            - List of picture URLs.
+
+            Raises:
+            - httpx.HTTPError: If the upstream call fails.
+        """
+        url = self.url if count == 1 else f"{self.url}/{count}"
+        start = time.perf_counter()
+        outcome = "error"
+        try:
+            response = await self._client.get(url)
+            response.raise_for_status()
+            message = response.json()["message"]
+            outcome = "success"
+        finally:
+            dog_picture_fetch_duration.observe(time.perf_counter() - start, outcome=outcome)
+        return message if isinstance(message, list) else [message]
+
+    async def _refill(self):
+        backoff = 1
+        while True:
+            await self._refill_needed.wait()
+            try:
+                while len(self._reservoir) < self.size:
+                    missing = min(self.batch, self.size - len(self._reservoir))
+                    self._reservoir.extend(await self.fetch(missing))
+                self._refill_needed.clear()
+                backoff = 1
+            except Exception as e:
+                # Any error is retried, the prefetcher must not stop silently
+                logger.warning(f"Error prefetching pictures: {e!r}")
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, 60)
+
+
+picture_provider = PictureProvider()
@@ -1,28 +1,43 @@
 import os
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
 # FastAPI imports
 from fastapi import HTTPException, status
 # SQLAlchemy imports
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import noload
 # Passlib imports
 from passlib.context import CryptContext
 # PyJWT imports
 from jose import JWTError, jwt
 # Typing imports
 from datetime import datetime, timedelta, timezone
-from typing import Union
+from typing import Optional, Tuple, Union
 # dotenv imports
 from dotenv import load_dotenv
 # Local imports
 from app.models.user import User
+from app.schemas.token import TokenData, UserPrincipal
+from .token_cache import token_cache
 
 load_dotenv()
 # Secret key to sign the JWT token
 SECRET_KEY = os.getenv("SECRET_KEY")
 ALGORITHM = os.getenv("ALGORITHM")
 ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES"))
+# bcrypt cost, hashes made with another cost are rehashed on the next login
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+# Maximum number of passwords hashed or verified at the same time
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", "4"))
 
 # Password hashing and verification
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+pwd_context = CryptContext(
+    schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=BCRYPT_ROUNDS,
+    bcrypt__min_rounds=BCRYPT_ROUNDS, bcrypt__max_rounds=BCRYPT_ROUNDS)
+# bcrypt releases the GIL, so a thread pool keeps hashing off the event loop
+password_executor = ThreadPoolExecutor(
+    max_workers=PASSWORD_HASH_WORKERS, thread_name_prefix="password")
 
 
 class JwtToken():
@@ -47,16 +62,26 @@ class JwtToken():
         encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
         return encoded_jwt
 
-    def decode_token(self, db, token: str):
+    async def decode_token(self, db, token: str) -> UserPrincipal:
         """
-            Decode and validate a JSON Web Token (JWT) to obtain its payload.
+            Decode and validate a JSON Web Token (JWT) and resolve its user.
+
+            Verified tokens are cached until their expiration, so repeated
+            calls with the same token skip the signature check and the query.
 
             Parameters:
+            - db (AsyncSession): Database session.
             - token (str): The JWT token to be decoded and validated.
 
+            Returns:
+            - UserPrincipal: The user the token belongs to.
+
             Raises:
             - HTTPException 401 Unauthorized: If the token is invalid or expired.
         """
+        principal = token_cache.get(token)
+        if principal is not None:
+            return principal
         credentials_exception = HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Could not validate credentials",
@@ -68,11 +93,24 @@ class JwtToken():
             email = decoded_token.get("sub")
             if email is None:
                 raise credentials_exception
-            token_data = {"sub": email}
+            token_data = TokenData(email=email)
         except JWTError:
             raise credentials_exception
-        user = self.get_user(db, email=token_data.email)
-        return user
+        user = await self.get_user(db, email=token_data.email)
+        if user is None:
+            raise credentials_exception
+        principal = UserPrincipal.from_orm(user)
+        token_cache.set(token, principal, decoded_token["exp"])
+        return principal
+
+    def invalidate_user(self, user_id: int):
+        """
+            Forget the cached tokens of a user, after it is updated or deleted.
+
+            Parameters:
+            - user_id (int): ID of the user.
+        """
+        token_cache.invalidate_user(user_id)
 
     def verify_password(self, plain_password, hashed_password) -> bool:
         """
@@ -98,26 +136,57 @@ class JwtToken():
             - str: The hashed password.
         """
         return pwd_context.hash(password)
-    
-    def get_user(self, db: Session, email: str):
+
+    async def get_password_hash_async(self, password) -> str:
+        """
+            Hash a password in the password thread pool.
+
+            Parameters:
+            - password (str): The password to hash.
+
+            Returns:
+            - str: The hashed password.
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(password_executor, pwd_context.hash, password)
+
+    async def verify_and_update_password(self, plain_password, hashed_password) -> Tuple[bool, Optional[str]]:
+        """
+            Verify a password in the password thread pool, and rehash it if
+            the stored hash does not use the configured bcrypt cost.
+
+            Parameters:
+            - plain_password (str): The plain text password to verify.
+            - hashed_password (str): The hashed password to compare against.
+
+            Returns:
+            - Tuple[bool, Optional[str]]: Whether the password matches, and the
+              new hash to store or None when the current one is up to date.
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            password_executor, pwd_context.verify_and_update, plain_password, hashed_password)
+
+    async def get_user(self, db: AsyncSession, email: str):
         """
-            Get a user by email.
+            Get a user by email, without their dogs.
 
             Parameters:
-            - db (Session): Database session.
+            - db (AsyncSession): Database session.
             - email (str): Email of the user to retrieve.
 
             Returns:
             - User: The user with the specified email.
         """
-        return db.query(User).filter(User.email == email).first()
+        result = await db.execute(select(User).options(noload(User.dog)).filter(User.email == email))
+        return result.scalars().first()
 
-    def authenticate_user(self, db: Session, email: str, password: str):
+    async def authenticate_user(self, db: AsyncSession, email: str, password: str):
         """
         Authenticate a user.
 
         Parameters:
-        - db (Session): Database session.
+        - db (AsyncSession): Database session.
         - email (str): Email of the user attempting to log in.
         - password (str): Password provided by the user.
 
@@ -126,14 +195,19 @@ class JwtToken():
 
         """
         # Check if the user exists in the database
-        existing_user = self.get_user(db, email)
+        existing_user = await self.get_user(db, email)
         if not existing_user:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
         # Check if the password is correct
-        if not self.verify_password(password, existing_user.hashed_password):
+        verified, new_hash = await self.verify_and_update_password(password, existing_user.hashed_password)
+        if not verified:
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED, detail="Incorrect password or email")
+        # Store the hash again if the bcrypt cost changed
+        if new_hash:
+            existing_user.hashed_password = new_hash
+            await db.commit()
         return existing_user
 
 
@@ -0,0 +1,80 @@
+import os
+import time
+from collections import OrderedDict
+# Typing imports
+from typing import Dict, Optional, Set
+# dotenv imports
+from dotenv import load_dotenv
+# Local imports
+from app.schemas.token import UserPrincipal
+
+load_dotenv()
+# Maximum number of verified tokens kept in memory
+TOKEN_CACHE_SIZE = int(os.getenv("TOKEN_CACHE_SIZE", "10000"))
+# Maximum time a verified token is trusted without checking it again, also the
+# delay before other processes see a user update or deletion
+TOKEN_CACHE_TTL_SECONDS = int(os.getenv("TOKEN_CACHE_TTL_SECONDS", "30"))
+
+
+class TokenCache():
+    """
+        Bounded LRU cache of verified token -> user principal.
+
+        Entries expire at the token `exp` or after the TTL, whichever comes
+        first, and are dropped when the user is updated or deleted. That
+        drop only reaches the process handling the change, the other workers
+        keep trusting the tokens of the user for up to the TTL.
+    """
+
+    def __init__(self, max_size: int = TOKEN_CACHE_SIZE, ttl: int = TOKEN_CACHE_TTL_SECONDS):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, tuple[float, UserPrincipal]]" = OrderedDict()
+        self._tokens_by_user: Dict[int, Set[str]] = {}
+
+    def get(self, token: str) -> Optional[UserPrincipal]:
+        """
+            Get the principal of a verified token, None if unknown or expired.
+        """
+        entry = self._entries.get(token)
+        if entry is None:
+            return None
+        expires, principal = entry
+        if expires <= time.time():
+            self._remove(token)
+            return None
+        self._entries.move_to_end(token)
+        return principal
+
+    def set(self, token: str, principal: UserPrincipal, exp: float):
+        """
+            Cache a verified token.
+
+            Args:
+            - token (str): The verified JWT.
+            - principal (UserPrincipal): User the token belongs to.
+            - exp (float): Token expiration as a UNIX timestamp.
+        """
+        self._entries[token] = (min(exp, time.time() + self.ttl), principal)
+        self._entries.move_to_end(token)
+        self._tokens_by_user.setdefault(principal.id, set()).add(token)
+        while len(self._entries) > self.max_size:
+            self._remove(next(iter(self._entries)))
+
+    def invalidate_user(self, user_id: int):
+        """
+            Drop every cached token of a user.
+        """
+        for token in self._tokens_by_user.pop(user_id, set()):
+            self._entries.pop(token, None)
+
+    def _remove(self, token: str):
+        _, principal = self._entries.pop(token)
+        tokens = self._tokens_by_user.get(principal.id)
+        if tokens is not None:
+            tokens.discard(token)
+            if not tokens:
+                del self._tokens_by_user[principal.id]
+
+
+token_cache = TokenCache()
@@ -0,0 +1 @@
+from .results import task_results
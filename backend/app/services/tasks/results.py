@@ -0,0 +1,138 @@
+import os
+import time
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+# FastAPI imports
+from fastapi import HTTPException, status
+# Celery imports
+from celery import states
+from celery.backends.base import BaseKeyValueStoreBackend, DisabledBackend
+from celery.backends.redis import RedisBackend
+# Typing imports
+from typing import Dict, List, Sequence
+# dotenv imports
+from dotenv import load_dotenv
+# Local imports
+from app.core.celery import celery
+from app.schemas.task import TaskStatus
+
+load_dotenv()
+# Longest a client can wait for tasks to finish in one request
+TASK_MAX_WAIT_SECONDS = float(os.getenv("TASK_MAX_WAIT_SECONDS", "30"))
+# Delay between result backend reads while waiting, doubled up to the maximum
+TASK_POLL_MIN_SECONDS = float(os.getenv("TASK_POLL_MIN_SECONDS", "0.05"))
+TASK_POLL_MAX_SECONDS = float(os.getenv("TASK_POLL_MAX_SECONDS", "0.25"))
+# Maximum number of requests waiting on Redis at the same time, the others
+# queue for a free waiter
+TASK_WAITERS = int(os.getenv("TASK_WAITERS", "32"))
+
+# A waiter blocks its thread until the tasks finish, a pool of its own keeps
+# the waiters from starving the default executor
+waiter_executor = ThreadPoolExecutor(max_workers=TASK_WAITERS, thread_name_prefix="task-waiter")
+
+
+class TaskResults():
+    """
+        Read task states from the Celery result backend, optionally waiting for them.
+
+        On Redis the waiters subscribe to the channels the backend publishes
+        every result on, so a finished task is returned as soon as it is
+        stored. Other backends are polled with a delay doubling from
+        `min_delay` to `max_delay`, which bounds how late a finished task is
+        returned. Backend calls are blocking and run in executors so the
+        event loop keeps serving other requests. No database connection is
+        used.
+    """
+
+    def __init__(self, min_delay: float = TASK_POLL_MIN_SECONDS, max_delay: float = TASK_POLL_MAX_SECONDS):
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+
+    def _fetch(self, task_ids: Sequence[str]) -> Dict[str, dict]:
+        """
+            Read the metadata of the tasks, with one round trip on key-value backends.
+        """
+        backend = celery.backend
+        if not isinstance(backend, BaseKeyValueStoreBackend):
+            return {task_id: backend.get_task_meta(task_id) for task_id in task_ids}
+        values = backend.mget([backend.get_key_for_task(task_id) for task_id in task_ids])
+        if isinstance(values, dict):
+            values = [values.get(backend.get_key_for_task(task_id)) for task_id in task_ids]
+        return {task_id: backend.decode_result(value) if value else {"status": states.PENDING}
+                for task_id, value in zip(task_ids, values)}
+
+    @staticmethod
+    def _status(task_id: str, meta: dict) -> TaskStatus:
+        result = meta.get("result")
+        if isinstance(result, BaseException):
+            result = f"{type(result).__name__}: {result}"
+        return TaskStatus(task_id=task_id, status=meta["status"], ready=meta["status"] in states.READY_STATES,
+                          result=result, date_done=meta.get("date_done"))
+
+    def _wait(self, task_ids: Sequence[str], timeout: float) -> Dict[str, dict]:
+        """
+            Wait up to `timeout` seconds for the tasks to finish, from the
+            results published by the Redis backend.
+        """
+        backend = celery.backend
+        channels = {backend.get_key_for_task(task_id): task_id for task_id in task_ids}
+        pubsub = backend.client.pubsub(ignore_subscribe_messages=True)
+        try:
+            pubsub.subscribe(*channels)
+            # Read after subscribing, so a result stored in between is not missed
+            metas = self._fetch(task_ids)
+            pending = {task_id for task_id, meta in metas.items() if meta["status"] not in states.READY_STATES}
+            deadline = time.monotonic() + timeout
+            while pending:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                message = pubsub.get_message(timeout=remaining)
+                if message is None or message["type"] != "message":
+                    continue
+                task_id = channels.get(message["channel"])
+                if task_id is None:
+                    continue
+                metas[task_id] = backend.decode_result(message["data"])
+                if metas[task_id]["status"] in states.READY_STATES:
+                    pending.discard(task_id)
+            return metas
+        finally:
+            pubsub.close()
+
+    async def get(self, task_ids: Sequence[str], wait: float = 0) -> List[TaskStatus]:
+        """
+            Get the status of the tasks, waiting up to `wait` seconds for all of them to finish.
+
+            Args:
+            - task_ids: IDs of the tasks.
+            - wait (float): Seconds to wait, 0 to return at once.
+
+            Returns:
+            - The status of each task, in the order of `task_ids`.
+
+            Raises:
+            - HTTPException 503 Service Unavailable: If no result backend is configured.
+        """
+        if isinstance(celery.backend, DisabledBackend):
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Task results are not available, no Celery result backend is configured")
+        loop = asyncio.get_running_loop()
+        wait = min(wait, TASK_MAX_WAIT_SECONDS)
+        if wait > 0 and isinstance(celery.backend, RedisBackend):
+            metas = await loop.run_in_executor(waiter_executor, self._wait, task_ids, wait)
+            return [self._status(task_id, metas[task_id]) for task_id in task_ids]
+        deadline = loop.time() + wait
+        delay = self.min_delay
+        while True:
+            metas = await loop.run_in_executor(None, self._fetch, task_ids)
+            statuses = [self._status(task_id, metas[task_id]) for task_id in task_ids]
+            remaining = deadline - loop.time()
+            if remaining <= 0 or all(task.ready for task in statuses):
+                return statuses
+            await asyncio.sleep(min(delay, remaining))
+            delay = min(delay * 2, self.max_delay)
+
+
+task_results = TaskResults()
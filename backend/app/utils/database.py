@@ -1,6 +1,11 @@
 import logging
+# FastAPI imports
+from fastapi import Request
+# Typing imports
+from typing import Optional
 # Local imports
-from app.db.database import SessionLocal
+from app.db.database import SessionLocal, AsyncSessionLocal
+from app.db.replicas import REPLICA_STICKY_COOKIE, replica_router
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -12,3 +17,46 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+def client_key(request: Request) -> str:
+    """
+        Identify the client of a request for read-your-writes, by its
+        credentials or else its address.
+    """
+    return request.headers.get("authorization") or (request.client.host if request.client else "")
+
+
+def sticky_until(request: Request) -> Optional[float]:
+    """
+        End of the read-your-writes window sent back by the client, if any.
+    """
+    try:
+        return float(request.cookies[REPLICA_STICKY_COOKIE])
+    except (KeyError, ValueError):
+        return None
+
+
+async def get_async_db(request: Request):
+    """
+        Session on the primary. Requests using it may write, so the client
+        reads from the primary for a while after it, on every worker through
+        the sticky cookie set by ReplicaStickyMiddleware.
+    """
+    client = client_key(request)
+    replica_router.mark_write(client)
+    request.state.primary = True
+    async with AsyncSessionLocal() as db:
+        yield db
+    # The window starts again once the write is committed
+    replica_router.mark_write(client)
+
+
+async def get_read_db(request: Request):
+    """
+        Session for read-only requests, on a healthy replica unless the
+        client wrote recently.
+    """
+    engine = replica_router.read_engine(client_key(request), sticky_until(request))
+    async with AsyncSessionLocal(bind=engine) as db:
+        yield db
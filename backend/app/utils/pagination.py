@@ -0,0 +1,60 @@
+import base64
+import binascii
+# FastAPI imports
+from fastapi import HTTPException, status
+# Typing imports
+from typing import Mapping, Optional, Sequence
+
+# Response header carrying the cursor of the next page
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def encode_cursor(obj_id: int) -> str:
+    """
+        Encode the ID of the last register of a page as an opaque cursor.
+
+        Args:
+        - obj_id (int): ID of the last register returned.
+
+        Returns:
+        - str: URL safe cursor.
+    """
+    return base64.urlsafe_b64encode(str(obj_id).encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> int:
+    """
+        Decode an opaque cursor back into the ID it points after.
+
+        Args:
+        - cursor (str): Cursor returned by a previous page.
+
+        Returns:
+        - int: ID of the last register of the previous page.
+
+        Raises:
+        - HTTPException 400 Bad Request: If the cursor is malformed.
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        return int(base64.urlsafe_b64decode(padded.encode()).decode())
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+
+
+def next_cursor(db_objs: Sequence, limit: int) -> Optional[str]:
+    """
+        Build the cursor of the page following the given one.
+
+        Args:
+        - db_objs: Registers (or row dicts) of the current page, ordered by ID.
+        - limit (int): Page size requested.
+
+        Returns:
+        - The next cursor, or None when the page is the last one.
+    """
+    if not db_objs or len(db_objs) < limit:
+        return None
+    last = db_objs[-1]
+    return encode_cursor(last["id"] if isinstance(last, Mapping) else last.id)
@@ -0,0 +1,39 @@
+import os
+# FastAPI imports
+from fastapi import HTTPException, status
+# Pydantic imports
+from pydantic import BaseModel
+# Typing imports
+from typing import List, Optional, Type
+# dotenv imports
+from dotenv import load_dotenv
+
+load_dotenv()
+# Serve the list endpoints from plain rows through orjson, skipping the ORM
+# objects and the response model validation of the trusted database rows
+FAST_SERIALIZATION = os.getenv("FAST_SERIALIZATION", "false").lower() == "true"
+
+
+def parse_fields(fields: Optional[str], schema: Type[BaseModel]) -> Optional[List[str]]:
+    """
+        Parse and validate a sparse fieldset, e.g. "id,name", against a response schema.
+
+        Args:
+        - fields (str): Comma separated field names, None or empty for every field.
+        - schema: Response schema the fields must belong to.
+
+        Returns:
+        - The field names with "id" first, as it is always returned, or None for every field.
+
+        Raises:
+        - HTTPException 400 Bad Request: If a field is not in the schema.
+    """
+    if not fields:
+        return None
+    names = [name.strip() for name in fields.split(",") if name.strip()]
+    unknown = [name for name in names if name not in schema.__fields__]
+    if unknown:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unknown fields: {', '.join(unknown)}. Available: {', '.join(schema.__fields__)}")
+    return ["id"] + [name for name in dict.fromkeys(names) if name != "id"]
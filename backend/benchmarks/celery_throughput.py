@@ -0,0 +1,107 @@
+"""
+    Celery throughput benchmark.
+
+    Runs against the in-memory broker by default, so it measures the Celery
+    overhead of the app configuration and not the network. It reports three
+    things as JSON:
+
+    - publish: tasks per second published with a broker connection taken
+      from the pool for every task, against one shared producer as the
+      outbox relay does.
+    - results: tasks per second run eagerly with `ignore_result`, against
+      tasks that store their result in `--result-backend`. Pass a Redis URL
+      to see the cost of results nobody reads.
+    - concurrency: tasks per second of an I/O bound task (`--task-ms`) run
+      by 1, 2, 4... threads. This is how a `threads` worker scales with
+      `CELERY_WORKER_CONCURRENCY`.
+
+    Usage:
+        python -m benchmarks.celery_throughput --tasks 2000
+        python -m benchmarks.celery_throughput --result-backend redis://localhost:6379/0
+"""
+import argparse
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+# Typing imports
+from typing import Callable, Sequence
+
+TASK_NAME = "benchmarks.celery_throughput.noop"
+
+
+def _rate(count: int, operation: Callable[[], None]) -> float:
+    start = time.perf_counter()
+    operation()
+    return round(count / (time.perf_counter() - start), 1)
+
+
+def run(tasks: int, task_ms: float, concurrency: Sequence[int], broker_url: str, result_backend: str) -> dict:
+    """
+        Configure the app against the given broker and run every benchmark.
+    """
+    os.environ["CELERY_BROKER_URL"] = broker_url
+    os.environ["CELERY_RESULT_BACKEND"] = result_backend
+    from app.core.celery import celery
+    # Eager tasks only write to the result backend when asked to
+    celery.conf.task_store_eager_result = True
+
+    @celery.task(name=f"{TASK_NAME}_ignored", ignore_result=True)
+    def noop_ignored(ms: float = 0):
+        if ms:
+            time.sleep(ms / 1000)
+
+    @celery.task(name=f"{TASK_NAME}_stored", ignore_result=False)
+    def noop_stored(ms: float = 0):
+        if ms:
+            time.sleep(ms / 1000)
+        return ms
+
+    results = {"tasks": tasks, "task_ms": task_ms}
+
+    def publish_each():
+        for _ in range(tasks):
+            celery.send_task(noop_ignored.name)
+
+    def publish_shared():
+        with celery.producer_or_acquire() as producer:
+            for _ in range(tasks):
+                celery.send_task(noop_ignored.name, producer=producer)
+
+    publish_each()  # Warm up the connection pool
+    results["publish"] = {
+        "per_task_connection_per_s": _rate(tasks, publish_each),
+        "shared_producer_per_s": _rate(tasks, publish_shared),
+    }
+
+    results["results"] = {
+        "ignore_result_per_s": _rate(tasks, lambda: [noop_ignored.apply() for _ in range(tasks)]),
+        "stored_result_per_s": _rate(tasks, lambda: [noop_stored.apply() for _ in range(tasks)]),
+    }
+
+    # An I/O bound task is limited by its own latency, not by the CPU
+    sleeping = min(tasks, max(concurrency) * 20)
+    results["concurrency"] = {}
+    for threads in concurrency:
+        with ThreadPoolExecutor(threads) as executor:
+            def run_all():
+                for future in [executor.submit(noop_ignored.apply, args=(task_ms,)) for _ in range(sleeping)]:
+                    future.result()
+            results["concurrency"][str(threads)] = _rate(sleeping, run_all)
+    results["concurrency_ideal_per_thread"] = round(1000 / task_ms, 1) if task_ms else None
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Celery throughput benchmark.")
+    parser.add_argument("--tasks", type=int, default=2000)
+    parser.add_argument("--task-ms", type=float, default=10)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 2, 4, 8, 16])
+    parser.add_argument("--broker-url", default="memory://")
+    parser.add_argument("--result-backend", default="cache+memory://")
+    args = parser.parse_args()
+    print(json.dumps(run(args.tasks, args.task_ms, args.concurrency, args.broker_url, args.result_backend), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,37 @@
+"""
+    Local stand-in for the dog.ceo random image API.
+
+    Serves the two endpoints used by the picture provider so tests and
+    benchmarks do not depend on the real service. Point the app at it with
+    DOG_PICTURE_URL=http://localhost:8001/api/breeds/image/random.
+
+    Usage:
+        uvicorn benchmarks.dog_ceo_stub:app --port 8001
+"""
+import asyncio
+import itertools
+import os
+# FastAPI imports
+from fastapi import FastAPI, Path
+
+# Simulated upstream latency in milliseconds
+STUB_LATENCY_MS = int(os.getenv("STUB_LATENCY_MS", "0"))
+
+app = FastAPI()
+_counter = itertools.count(1)
+
+
+def _picture() -> str:
+    return f"https://images.dog.ceo/breeds/stub/{next(_counter)}.jpg"
+
+
+@app.get("/api/breeds/image/random")
+async def random_image():
+    await asyncio.sleep(STUB_LATENCY_MS / 1000)
+    return {"message": _picture(), "status": "success"}
+
+
+@app.get("/api/breeds/image/random/{count}")
+async def random_images(count: int = Path(..., ge=1, le=50)):
+    await asyncio.sleep(STUB_LATENCY_MS / 1000)
+    return {"message": [_picture() for _ in range(count)], "status": "success"}
@@ -0,0 +1,265 @@
+"""
+    End-to-end load test.
+
+    Boots app.main:app in-process against SQLite (or the database given with
+    --database-url), the dog.ceo stub served on a local port and an
+    in-memory Celery broker, seeds users and dogs, then drives a request mix
+    with a fixed number of concurrent clients. Prints (or writes with
+    --output) a JSON report with throughput, latency percentiles and error
+    rate, overall and per operation, to compare runs before and after a
+    change. With --url it drives an already running server instead.
+
+    Mixes:
+    - read: dogs by id and name, dog list paging with cursors, users by id.
+    - login: login bursts through /v1/user/access-token.
+    - write: dog creation.
+    - mixed: all of the above.
+
+    Usage:
+        python -m benchmarks.loadtest --mix mixed --concurrency 32 --duration 20 --output report.json
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import socket
+import tempfile
+import time
+from datetime import datetime, timezone
+# HTTPX imports
+import httpx
+# Local imports
+from benchmarks.concurrency import percentile
+
+# Operation weights of each mix
+MIXES = {
+    "read": {"dog_by_id": 50, "dog_by_name": 25, "dog_page": 20, "user_by_id": 5},
+    "login": {"login": 100},
+    "write": {"create_dog": 100},
+    "mixed": {"dog_by_id": 35, "dog_by_name": 15, "dog_page": 15, "user_by_id": 5, "login": 10, "create_dog": 20},
+}
+PASSWORD = "load-password"
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def configure(database_url: str, stub_port: int):
+    """
+        Point the app at the local stand-ins, before it is imported.
+    """
+    os.environ["DATABASE_URL"] = database_url
+    os.environ["CELERY_BROKER_URL"] = "memory://"
+    os.environ["CELERY_RESULT_BACKEND"] = "cache+memory://"
+    os.environ["CACHE_REDIS_URL"] = ""
+    os.environ["DOG_PICTURE_URL"] = f"http://127.0.0.1:{stub_port}/api/breeds/image/random"
+
+
+class Client:
+    """
+        State of one simulated client: its token and its place in the dog list.
+    """
+
+    def __init__(self, index: int, rng: random.Random):
+        self.index = index
+        self.rng = rng
+        self.cursor = None
+        self.created = 0
+
+
+class LoadTest:
+    """
+        Seeds the data, runs the operations of a mix and collects latencies.
+    """
+
+    def __init__(self, client: httpx.AsyncClient, mix: str, users: int, dogs: int, seed: int):
+        self.client = client
+        self.weights = MIXES[mix]
+        self.users = users
+        self.dogs = dogs
+        self.seed = seed
+        self.run_id = f"{int(time.time())}-{seed}"
+        self.user_ids = []
+        self.dog_ids = []
+        self.dog_names = []
+        self.headers = {}
+        self.latencies = {name: [] for name in self.weights}
+        self.errors = {name: 0 for name in self.weights}
+
+    def _email(self, i: int) -> str:
+        return f"load-{self.run_id}-{i}@example.com"
+
+    async def seed_data(self):
+        """
+            Create the users, log the first one in and create the dogs in bulk.
+        """
+        for i in range(self.users):
+            response = await self.client.post("/v1/user/", json={
+                "name": "load", "last_name": "test", "email": self._email(i), "password": PASSWORD})
+            response.raise_for_status()
+            self.user_ids.append(response.json()["id"])
+        response = await self.client.post("/v1/user/access-token", data={
+            "username": self._email(0), "password": PASSWORD})
+        response.raise_for_status()
+        self.headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+        names = [f"load-{self.run_id}-{i}" for i in range(self.dogs)]
+        for start in range(0, len(names), 500):
+            response = await self.client.post("/v1/dog/bulk", headers=self.headers, json=[
+                {"name": name, "is_adopted": i % 2 == 0} for i, name in enumerate(names[start:start + 500])])
+            response.raise_for_status()
+            self.dog_ids.extend(result["id"] for result in response.json())
+        self.dog_names = names
+
+    async def dog_by_id(self, state: Client):
+        return await self.client.get(f"/v1/dog/{state.rng.choice(self.dog_ids)}")
+
+    async def dog_by_name(self, state: Client):
+        return await self.client.get(f"/v1/dog/name/{state.rng.choice(self.dog_names)}")
+
+    async def dog_page(self, state: Client):
+        params = {"limit": 20}
+        if state.cursor:
+            params["cursor"] = state.cursor
+        response = await self.client.get("/v1/dog/", params=params)
+        if response.status_code == 404 and state.cursor:
+            # The previous page was full and the last one, start over
+            response = await self.client.get("/v1/dog/", params={"limit": 20})
+        state.cursor = response.headers.get("X-Next-Cursor")
+        return response
+
+    async def user_by_id(self, state: Client):
+        return await self.client.get(f"/v1/user/{state.rng.choice(self.user_ids)}")
+
+    async def login(self, state: Client):
+        return await self.client.post("/v1/user/access-token", data={
+            "username": self._email(state.rng.randrange(self.users)), "password": PASSWORD})
+
+    async def create_dog(self, state: Client):
+        state.created += 1
+        return await self.client.post("/v1/dog/", headers=self.headers, json={
+            "name": f"load-{self.run_id}-c{state.index}-{state.created}", "is_adopted": False})
+
+    async def _worker(self, index: int, deadline: float):
+        state = Client(index, random.Random(self.seed + index))
+        names, weights = list(self.weights), list(self.weights.values())
+        while time.perf_counter() < deadline:
+            name = state.rng.choices(names, weights)[0]
+            start = time.perf_counter()
+            try:
+                response = await getattr(self, name)(state)
+                failed = response.status_code >= 400
+            except httpx.HTTPError:
+                failed = True
+            self.latencies[name].append(time.perf_counter() - start)
+            if failed:
+                self.errors[name] += 1
+
+    async def run(self, concurrency: int, duration: float) -> float:
+        """
+            Run the mix with `concurrency` clients for `duration` seconds,
+            return the elapsed time.
+        """
+        started = time.perf_counter()
+        await asyncio.gather(*(self._worker(i, started + duration) for i in range(concurrency)))
+        return time.perf_counter() - started
+
+    def report(self, elapsed: float) -> dict:
+        """
+            Summarize the latencies and errors, overall and per operation.
+        """
+        def summary(latencies, errors):
+            return {
+                "requests": len(latencies),
+                "errors": errors,
+                "error_rate": round(errors / len(latencies), 4) if latencies else 0.0,
+                "throughput_rps": round(len(latencies) / elapsed, 1),
+                "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+                "p95_ms": round(percentile(latencies, 95) * 1000, 2),
+                "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+            }
+
+        every = [latency for latencies in self.latencies.values() for latency in latencies]
+        return {
+            **summary(every, sum(self.errors.values())),
+            "operations": {
+                name: summary(self.latencies[name], self.errors[name]) for name in self.weights},
+        }
+
+
+async def run(args) -> dict:
+    """
+        Set up the stand-ins and the app, run the load test and return the report.
+    """
+    started_at = datetime.now(timezone.utc).isoformat()
+    stub_server = None
+    if args.url:
+        client = httpx.AsyncClient(base_url=args.url, timeout=30, limits=httpx.Limits(
+            max_connections=args.concurrency, max_keepalive_connections=args.concurrency))
+        app = None
+    else:
+        import uvicorn
+        stub_port = _free_port()
+        database_url = args.database_url or f"sqlite:///{tempfile.mkdtemp()}/loadtest.db"
+        configure(database_url, stub_port)
+        from benchmarks.dog_ceo_stub import app as stub_app
+        stub_server = uvicorn.Server(uvicorn.Config(stub_app, host="127.0.0.1", port=stub_port, log_level="warning"))
+        stub_task = asyncio.create_task(stub_server.serve())
+        while not stub_server.started:
+            await asyncio.sleep(0.01)
+        from app.main import app
+        # One log line per request would dominate the run
+        logging.getLogger("app.utils.database").setLevel(logging.WARNING)
+        await app.router.startup()
+        client = httpx.AsyncClient(app=app, base_url="http://loadtest", timeout=30)
+    try:
+        async with client:
+            load_test = LoadTest(client, args.mix, args.users, args.dogs, args.seed)
+            await load_test.seed_data()
+            elapsed = await load_test.run(args.concurrency, args.duration)
+    finally:
+        if app is not None:
+            await app.router.shutdown()
+        if stub_server is not None:
+            stub_server.should_exit = True
+            await stub_task
+    return {
+        "started_at": started_at,
+        "target": args.url or "in-process",
+        "database": "external" if args.url else (args.database_url or "sqlite"),
+        "mix": args.mix,
+        "weights": MIXES[args.mix],
+        "concurrency": args.concurrency,
+        "duration_s": round(elapsed, 3),
+        "users": args.users,
+        "dogs": args.dogs,
+        **load_test.report(elapsed),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="End-to-end load test.")
+    parser.add_argument("--mix", choices=sorted(MIXES), default="mixed")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds to run the mix for.")
+    parser.add_argument("--users", type=int, default=10)
+    parser.add_argument("--dogs", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--database-url", help="Database of the in-process app, a temporary SQLite file by default.")
+    parser.add_argument("--url", help="Drive a running server instead of the in-process app.")
+    parser.add_argument("--output", help="Write the JSON report to this file.")
+    args = parser.parse_args()
+    report = asyncio.run(run(args))
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as output:
+            output.write(text + "\n")
+    print(text)
+
+
+if __name__ == "__main__":
+    main()
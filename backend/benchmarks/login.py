@@ -0,0 +1,89 @@
+"""
+    Login throughput benchmark.
+
+    Runs the app in-process, sends bursts of concurrent logins to
+    /v1/user/access-token and, at the same time, measures the latency of an
+    unrelated endpoint to show how much the logins stall the event loop.
+
+    Usage:
+        DATABASE_URL=sqlite:///./bench.db python -m benchmarks.login --logins 200 --concurrency 50
+"""
+import argparse
+import asyncio
+import json
+import time
+# HTTPX imports
+import httpx
+# Local imports
+from app.main import app
+from benchmarks.concurrency import percentile
+
+EMAIL = "bench-login@example.com"
+PASSWORD = "bench-password"
+
+
+async def run(logins: int, concurrency: int, probe_interval: float):
+    """
+        Run the benchmark and return a dict with the results.
+    """
+    async with httpx.AsyncClient(app=app, base_url="http://bench") as client:
+        response = await client.post("/v1/user/", json={
+            "name": "bench", "last_name": "login", "email": EMAIL, "password": PASSWORD})
+        if response.status_code not in (201, 400):
+            raise RuntimeError(f"Could not create the benchmark user: {response.text}")
+        semaphore = asyncio.Semaphore(concurrency)
+        login_latencies, probe_latencies = [], []
+        errors = 0
+        done = asyncio.Event()
+
+        async def login():
+            nonlocal errors
+            async with semaphore:
+                start = time.perf_counter()
+                response = await client.post("/v1/user/access-token", data={
+                    "username": EMAIL, "password": PASSWORD})
+                login_latencies.append(time.perf_counter() - start)
+                if response.status_code != 200:
+                    errors += 1
+
+        async def probe():
+            # Includes the time waiting for the event loop to wake the probe up
+            while not done.is_set():
+                start = time.perf_counter()
+                await asyncio.sleep(probe_interval)
+                await client.get("/openapi.json")
+                probe_latencies.append(time.perf_counter() - start - probe_interval)
+
+        probe_task = asyncio.create_task(probe())
+        started = time.perf_counter()
+        await asyncio.gather(*(login() for _ in range(logins)))
+        elapsed = time.perf_counter() - started
+        done.set()
+        await probe_task
+
+    return {
+        "logins": logins,
+        "concurrency": concurrency,
+        "errors": errors,
+        "elapsed_s": round(elapsed, 3),
+        "logins_per_s": round(logins / elapsed, 1),
+        "login_p50_ms": round(percentile(login_latencies, 50) * 1000, 2),
+        "login_p99_ms": round(percentile(login_latencies, 99) * 1000, 2),
+        "unrelated_requests": len(probe_latencies),
+        "unrelated_p50_ms": round(percentile(probe_latencies, 50) * 1000, 2),
+        "unrelated_max_ms": round(max(probe_latencies, default=0) * 1000, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Login throughput benchmark.")
+    parser.add_argument("--logins", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--probe-interval", type=float, default=0.01)
+    args = parser.parse_args()
+    result = asyncio.run(run(args.logins, args.concurrency, args.probe_interval))
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    main()
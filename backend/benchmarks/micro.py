@@ -0,0 +1,227 @@
+"""
+    Micro-benchmarks of the request hot paths.
+
+    Times the CRUD primitives, the ORM to response schema conversions, the
+    JWT encoding and decoding and the password check against a temporary
+    SQLite database with the cache disabled. Each benchmark is calibrated to
+    run for about --min-time seconds per round, and the median and minimum
+    time per operation over the rounds are reported. Baselines are compared
+    on the minimum, the least sensitive to noise from other processes.
+
+    Commands:
+    - run: print the results as JSON.
+    - save: run and store the results as the baseline.
+    - check: run and exit with status 1 when a benchmark is slower than its
+      baseline by more than --threshold (0.25 = 25%). The slower benchmarks
+      are run a second time first, to rule out a noisy run. Without a
+      baseline it exits with status 2, create one with `save` first.
+
+    Baselines depend on the machine and are not committed. Every run also
+    times a pure Python calibration loop, and timings are compared relative
+    to it, so a machine that is uniformly faster or slower than the one
+    that saved the baseline is not reported as a regression.
+
+    Usage:
+        python -m benchmarks.micro save
+        python -m benchmarks.micro check --threshold 0.25
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+# Typing imports
+from typing import Awaitable, Callable, Dict, Optional, Sequence
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(__file__), "baselines", "micro.json")
+
+
+def configure(database_url: str):
+    """
+        Point the app at a local database and disable the cache, before it is imported.
+    """
+    os.environ["DATABASE_URL"] = database_url
+    os.environ["CELERY_BROKER_URL"] = "memory://"
+    os.environ["CELERY_RESULT_BACKEND"] = "cache+memory://"
+    os.environ["CACHE_ENABLED"] = "false"
+    os.environ["CACHE_REDIS_URL"] = ""
+
+
+async def measure(operation: Callable[[], Awaitable], rounds: int, min_time: float) -> Dict[str, float]:
+    """
+        Time `operation`, calibrating the iterations so a round lasts at
+        least `min_time` seconds, and return the per operation timings.
+    """
+    iterations = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(iterations):
+            await operation()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time or iterations >= 1_000_000:
+            break
+        iterations *= 2 if elapsed <= 0 else max(2, min(10, int(min_time / elapsed) + 1))
+    timings = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        for _ in range(iterations):
+            await operation()
+        timings.append((time.perf_counter() - start) / iterations)
+    return {
+        "iterations": iterations,
+        "median_us": round(statistics.median(timings) * 1e6, 3),
+        "min_us": round(min(timings) * 1e6, 3),
+    }
+
+
+async def calibration():
+    """
+        Fixed pure Python work, timed to normalize the other benchmarks by
+        the speed of the machine.
+    """
+    total = 0
+    for i in range(10_000):
+        total += i * i % 7
+    return total
+
+
+async def run(rounds: int, min_time: float, only: Optional[str] = None,
+              names: Optional[Sequence[str]] = None) -> Dict[str, dict]:
+    """
+        Seed the database and run the benchmarks whose name contains `only`
+        or is in `names` (all by default).
+    """
+    configure(f"sqlite:///{tempfile.mkdtemp()}/micro.db")
+    from sqlalchemy import select
+    from sqlalchemy.orm import selectinload
+    from app.main import app  # noqa: F401, creates the tables
+    from app.db.database import AsyncSessionLocal
+    from app.models.dog import Dog
+    from app.models.user import User
+    from app.schemas.dog import DogCreate, DogResponse, DogUpdate
+    from app.schemas.user import UserResponse
+    from app.services.crud.dog.dog_crud import dog_crud
+    from app.services.security import jwt_token
+    from app.services.security.token_cache import token_cache
+
+    password = "micro-password"
+    async with AsyncSessionLocal() as db:
+        user = User(name="micro", last_name="bench", email="micro@example.com",
+                    hashed_password=jwt_token.get_password_hash(password))
+        db.add(user)
+        await db.flush()
+        db.add_all([Dog(name=f"micro-{i}", is_adopted=i % 2 == 0, user_id=user.id if i < 10 else None)
+                    for i in range(1000)])
+        await db.commit()
+        user_id, hashed_password = user.id, user.hashed_password
+
+    db = AsyncSessionLocal()
+    dog = await dog_crud._read(db, 1)
+    user = (await db.execute(
+        select(User).options(selectinload(User.dog)).filter(User.id == user_id))).scalars().first()
+    token = jwt_token.create_jwt_token({"sub": user.email})
+    counter = iter(range(10 ** 9))
+
+    async def crud_create():
+        await dog_crud._create(db, DogCreate(name=f"created-{next(counter)}", is_adopted=False))
+
+    async def jwt_decode():
+        token_cache._entries.clear()
+        await jwt_token.decode_token(db, token)
+
+    async def sync(function, *args):
+        return function(*args)
+
+    benchmarks = {
+        "calibration": calibration,
+        "crud_read": lambda: dog_crud._read(db, 500),
+        "crud_read_all": lambda: dog_crud._read_all(db, 0, 100),
+        "crud_read_by_name": lambda: dog_crud._read_by_name(db, "micro-500"),
+        "crud_create": crud_create,
+        "crud_update": lambda: dog_crud._update(db, 500, DogUpdate(name="micro-500", is_adopted=True)),
+        "dog_response_from_orm": lambda: sync(DogResponse.from_orm, dog),
+        "user_response_from_orm": lambda: sync(UserResponse.from_orm, user),
+        "jwt_create": lambda: sync(jwt_token.create_jwt_token, {"sub": user.email}),
+        "jwt_decode": jwt_decode,
+        "jwt_decode_cached": lambda: jwt_token.decode_token(db, token),
+        "verify_password": lambda: sync(jwt_token.verify_password, password, hashed_password),
+    }
+    results = {}
+    try:
+        for name, operation in benchmarks.items():
+            if (only and only not in name) or (names is not None and name not in names):
+                continue
+            results[name] = await measure(operation, rounds, min_time)
+    finally:
+        await db.close()
+    return results
+
+
+def compare(results: Dict[str, dict], baseline: Dict[str, dict], threshold: float) -> Dict[str, dict]:
+    """
+        Return the benchmarks slower than their baseline minimum by more than
+        `threshold`, after scaling the baseline by the calibration timings.
+    """
+    speed = 1.0
+    if "calibration" in results and "calibration" in baseline:
+        speed = results["calibration"]["min_us"] / baseline["calibration"]["min_us"]
+    regressions = {}
+    for name, result in results.items():
+        if name not in baseline or name == "calibration":
+            continue
+        expected_us = baseline[name]["min_us"] * speed
+        ratio = result["min_us"] / expected_us
+        if ratio > 1 + threshold:
+            regressions[name] = {
+                "baseline_us": baseline[name]["min_us"],
+                "expected_us": round(expected_us, 3),
+                "min_us": result["min_us"],
+                "slowdown": round(ratio - 1, 3),
+            }
+    return regressions
+
+
+def save(results: Dict[str, dict], path: str):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "w") as output:
+        json.dump(results, output, indent=2)
+        output.write("\n")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Micro-benchmarks of the request hot paths.")
+    parser.add_argument("command", choices=("run", "save", "check"))
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--threshold", type=float, default=0.25, help="Allowed slowdown, 0.25 = 25%%.")
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--min-time", type=float, default=0.2, help="Minimum seconds per round.")
+    parser.add_argument("--only", help="Run the benchmarks whose name contains this.")
+    args = parser.parse_args()
+    if args.command == "check" and not os.path.exists(args.baseline):
+        print(f"No baseline at {args.baseline}, create one with `save` first", file=sys.stderr)
+        sys.exit(2)
+    results = asyncio.run(run(args.rounds, args.min_time, args.only))
+    print(json.dumps(results, indent=2))
+    if args.command == "save":
+        save(results, args.baseline)
+    elif args.command == "check":
+        with open(args.baseline) as baseline_file:
+            baseline = json.load(baseline_file)
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            names = [name for name in ("calibration", *regressions) if name in results]
+            rerun = asyncio.run(run(args.rounds, args.min_time, names=names))
+            for name, result in rerun.items():
+                if result["min_us"] < results[name]["min_us"]:
+                    results[name] = result
+            regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(json.dumps({"regressions": regressions}, indent=2), file=sys.stderr)
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""
+    Dog name lookup latency benchmark.
+
+    Seeds the dog table of DATABASE_URL up to --rows registers and times the
+    case-insensitive name lookup used before (name ILIKE :name, no index)
+    and now (lower(name) = :name, served by ix_dog_name_lower).
+
+    Usage:
+        DATABASE_URL=postgresql://... python -m benchmarks.name_lookup --rows 1000000
+"""
+import argparse
+import json
+import random
+import time
+# SQLAlchemy imports
+from sqlalchemy import func, insert, select
+# Local imports
+from app.db.database import engine
+from app.db.migrations import run_migrations
+from app.models import Base, Dog
+
+
+def seed(rows: int, chunk: int = 10000):
+    """
+        Insert dogs until the table holds at least `rows` registers.
+    """
+    with engine.begin() as connection:
+        existing = connection.execute(select(func.count(Dog.id))).scalar()
+        for start in range(existing, rows, chunk):
+            connection.execute(insert(Dog), [
+                {"name": f"Dog{index}", "is_adopted": index % 2 == 0}
+                for index in range(start, min(start + chunk, rows))
+            ])
+
+
+def time_queries(query_for, names):
+    """
+        Run one lookup per name and return latency stats in milliseconds.
+    """
+    latencies = []
+    with engine.connect() as connection:
+        for name in names:
+            start = time.perf_counter()
+            connection.execute(query_for(name)).first()
+            latencies.append((time.perf_counter() - start) * 1000)
+    latencies.sort()
+    return {
+        "p50_ms": round(latencies[len(latencies) // 2], 3),
+        "p99_ms": round(latencies[int(len(latencies) * 0.99) - 1], 3),
+        "mean_ms": round(sum(latencies) / len(latencies), 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Dog name lookup latency benchmark.")
+    parser.add_argument("--rows", type=int, default=1000000)
+    parser.add_argument("--lookups", type=int, default=200)
+    args = parser.parse_args()
+    Base.metadata.create_all(bind=engine)
+    run_migrations(engine)
+    seed(args.rows)
+    names = [f"dog{random.randrange(args.rows)}" for _ in range(args.lookups)]
+    result = {
+        "rows": args.rows,
+        "lookups": args.lookups,
+        "ilike": time_queries(lambda name: select(Dog.id).filter(Dog.name.ilike(name)), names),
+        "lower_index": time_queries(lambda name: select(Dog.id).filter(func.lower(Dog.name) == name), names),
+    }
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    main()
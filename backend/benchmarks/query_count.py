@@ -0,0 +1,132 @@
+"""
+    Query count check for the users endpoints.
+
+    Seeds users with dogs, then counts the SQL statements issued by
+    GET /v1/user/ and GET /v1/user/{id}. The count must not grow with the
+    number of users in the page or of dogs per user, otherwise the loading
+    of UserResponse.dog has regressed to N+1 queries. Every count is
+    compared with EXPECTED_STATEMENTS and the check exits with status 1 when
+    one is above it, so it can run in CI. The cache is disabled, cached
+    reads issue no statements.
+
+    Usage:
+        DATABASE_URL=sqlite:///./bench.db python -m benchmarks.query_count
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+# HTTPX imports
+import httpx
+# SQLAlchemy imports
+from sqlalchemy import event, insert
+# Counts are for reads that reach the database
+os.environ["CACHE_ENABLED"] = "false"
+# Local imports
+from app.db.database import AsyncSessionLocal, async_engine
+from app.main import app
+from app.models.dog import Dog
+from app.models.user import User
+from app.services.crud.user.user_crud import DOG_LOADERS, user_crud
+
+
+# Statements allowed per read, whatever the number of users and dogs. Lists
+# read the users then the dogs of the page, "joined" reads both at once.
+EXPECTED_STATEMENTS = {
+    "GET /v1/user/?": 2,
+    "GET /v1/user/{id}": 1,
+    "_read_all load=selectin": 2,
+    "_read_all load=joined": 1,
+}
+
+
+def expected(key: str) -> int:
+    return next(count for prefix, count in EXPECTED_STATEMENTS.items() if key.startswith(prefix))
+
+
+class StatementCounter:
+    """
+        Counts the statements executed by the async engine.
+    """
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, conn, cursor, statement, parameters, context, executemany):
+        self.count += 1
+
+    def __enter__(self):
+        self.count = 0
+        event.listen(async_engine.sync_engine, "before_cursor_execute", self)
+        return self
+
+    def __exit__(self, *exc):
+        event.remove(async_engine.sync_engine, "before_cursor_execute", self)
+
+
+async def seed(users: int, dogs: int) -> int:
+    """
+        Insert `users` users with `dogs` dogs each, return the first user ID.
+    """
+    async with AsyncSessionLocal() as db:
+        db_objs = [User(name="bench", last_name="query", email=f"bench-query-{i}@example.com",
+                        hashed_password="bench") for i in range(users)]
+        db.add_all(db_objs)
+        await db.flush()
+        user_ids = [db_obj.id for db_obj in db_objs]
+        await db.execute(insert(Dog), [
+            {"name": f"bench-{user_id}-{i}", "is_adopted": True, "user_id": user_id}
+            for user_id in user_ids for i in range(dogs)])
+        await db.commit()
+        return user_ids[0]
+
+
+async def run(users: int, dogs: int, dogs_limit: int) -> dict:
+    """
+        Count the statements of each read for pages of 1 and `users` users.
+    """
+    first_id = await seed(users, dogs)
+    counts = {}
+    async with httpx.AsyncClient(app=app, base_url="http://bench") as client:
+        for size in (1, users):
+            with StatementCounter() as counter:
+                response = await client.get("/v1/user/", params={"limit": size})
+            response.raise_for_status()
+            counts[f"GET /v1/user/?limit={size}"] = counter.count
+        with StatementCounter() as counter:
+            response = await client.get(f"/v1/user/{first_id}")
+        response.raise_for_status()
+        counts["GET /v1/user/{id}"] = counter.count
+    async with AsyncSessionLocal() as db:
+        for load in DOG_LOADERS:
+            for limit in (None, dogs_limit):
+                for size in (1, users):
+                    with StatementCounter() as counter:
+                        db_objs = await user_crud._read_all(db, 0, size, load=load, dogs_limit=limit)
+                    capped = all(len(db_obj.dog) <= (limit or dogs) for db_obj in db_objs)
+                    counts[f"_read_all load={load} dogs_limit={limit} limit={size}"] = \
+                        counter.count if capped else "dogs not capped"
+                    db.expunge_all()
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Query count check for the users endpoints.")
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--dogs", type=int, default=5)
+    parser.add_argument("--dogs-limit", type=int, default=2)
+    args = parser.parse_args()
+    counts = asyncio.run(run(args.users, args.dogs, args.dogs_limit))
+    print(json.dumps(counts, indent=2))
+    failed = {key: count for key, count in counts.items()
+              if isinstance(count, str) or count > expected(key)}
+    if failed:
+        print("Reads above their expected statements, or with dogs not capped: "
+              + ", ".join(f"{key} = {count} (expected {expected(key)})" for key, count in failed.items()),
+              file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""
+    List serialization benchmark.
+
+    Compares, for a page of dogs and a page of users with their dogs, the
+    default path (ORM objects, pydantic orm_mode validation,
+    jsonable_encoder and json.dumps, as FastAPI does for a response_model)
+    with the FAST_SERIALIZATION path (plain row dicts and orjson). Reports
+    the rows serialized per second, database read included, as JSON.
+
+    Usage:
+        python -m benchmarks.serialization --rows 100 500
+"""
+import argparse
+import asyncio
+import json
+import tempfile
+# ORJSON imports
+import orjson
+# FastAPI imports
+from fastapi.encoders import jsonable_encoder
+# Local imports
+from benchmarks.micro import configure, measure
+
+
+async def run(page_sizes, rounds: int, min_time: float) -> dict:
+    """
+        Seed the database and time both paths for each page size.
+    """
+    configure(f"sqlite:///{tempfile.mkdtemp()}/serialization.db")
+    from app.main import app  # noqa: F401, creates the tables
+    from app.db.database import AsyncSessionLocal
+    from app.models.dog import Dog
+    from app.models.user import User
+    from app.schemas.dog import DogResponse
+    from app.schemas.user import UserResponse
+    from app.services.crud.dog.dog_crud import dog_crud
+    from app.services.crud.user.user_crud import user_crud
+
+    largest = max(page_sizes)
+    async with AsyncSessionLocal() as db:
+        users = [User(name=f"user-{i}", last_name="bench", email=f"serialization-{i}@example.com",
+                      hashed_password="hash") for i in range(largest)]
+        db.add_all(users)
+        await db.flush()
+        db.add_all([Dog(name=f"dog-{i}", is_adopted=i % 2 == 0, picture=f"https://images.dog.ceo/{i}.jpg",
+                        user_id=users[i % len(users)].id) for i in range(largest * 3)])
+        await db.commit()
+
+    def default(db_objs, schema):
+        return json.dumps(jsonable_encoder([schema.from_orm(db_obj) for db_obj in db_objs])).encode()
+
+    results = {}
+    db = AsyncSessionLocal()
+    try:
+        for size in page_sizes:
+            async def dogs_default():
+                db.expunge_all()
+                default(await dog_crud._read_all(db, 0, size), DogResponse)
+
+            async def dogs_fast():
+                orjson.dumps(await dog_crud._read_all_rows(db, 0, size))
+
+            async def users_default():
+                db.expunge_all()
+                default(await user_crud._read_all(db, 0, size), UserResponse)
+
+            async def users_fast():
+                orjson.dumps(await user_crud._read_all_rows(db, 0, size))
+
+            for name, operation in (("dogs_default", dogs_default), ("dogs_fast", dogs_fast),
+                                    ("users_default", users_default), ("users_fast", users_fast)):
+                timing = await measure(operation, rounds, min_time)
+                results[f"{name}_{size}"] = {
+                    "rows": size,
+                    "median_us": timing["median_us"],
+                    "rows_per_s": round(size / timing["median_us"] * 1e6),
+                }
+    finally:
+        await db.close()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="List serialization benchmark.")
+    parser.add_argument("--rows", type=int, nargs="+", default=[100, 500])
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--min-time", type=float, default=0.2)
+    args = parser.parse_args()
+    print(json.dumps(asyncio.run(run(args.rows, args.rounds, args.min_time)), indent=2))
+
+
+if __name__ == "__main__":
+    main()